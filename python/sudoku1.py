@@ -1,80 +1,190 @@
 import itertools
 import time
-from copy import deepcopy
 from functools import reduce
 
-import numpy as np
+from sudoku_topology import SIZE, get_topology, topology_for
 
 
+# 求解过程的事件回调, 代替debug时的print_step/print_rollback/print_grid, 子类只需覆盖关心的方法
+class SolveHook(object):
+    def on_step(self, sudoku, name, index, value):
+        pass
+
+    def on_rollback(self, sudoku, index, value):
+        pass
+
+    def on_grid(self, sudoku):
+        pass
+
+    # 一个Finder或一次猜测之后, 撤销日志从mark开始的部分就是这一步的变化, 用sudoku.changes_since(mark)取出
+    def on_changes(self, sudoku, name, mark):
+        pass
+
+
+# 候选数是Topology.intern得到的共享frozenset, 只能整体替换, 不能原地修改
 class SudokuPoint(object):
-    def __init__(self, index, candidates):
+    __slots__ = ("index", "cell", "value", "candidates")
+
+    def __init__(self, index, candidates, size=SIZE):
         self.index = index
+        self.cell = index[0] * size + index[1]
         self.value = None
         self.candidates = candidates
 
+    # 候选数的位掩码, 用于把候选数相同的格子分组
     def get_key(self):
-        return "".join(map(str, self.candidates))
+        key = 0
+        for n in self.candidates:
+            key |= 1 << n
+        return key
 
 
+# box为宫的边长, 不指定时按文本长度判断(81/256/625个格子)
 class Sudoku(object):
-    def __init__(self, text):
+    # Finder类 -> 针对这种数独存储方式的实现, FinderPipeline创建Finder时替换
+    finder_overrides = {}
+
+    def __init__(self, text, box=None):
+        self.topology = get_topology(box) if box else topology_for(text)
         self.grid = None
+        self.points = None
+        self.hook = None
+        self.units = None
+        self.regions = None
+        self.regions_without_blocks = None
+        self.cell_units = None
         self.count = 0
+        self.trail = []
+        # 候选数有变化, 等待唯一候选数法/隐性唯一候选数法检查的格子和区域
+        self.dirty_cells = set()
+        self.dirty_units = set()
+        # 各区域最后一次变化时的版本号, Finder据此跳过上次检查之后没有变化的区域
+        self.generation = 0
+        self.unit_generations = [0] * len(self.topology.units)
 
         self.init_grid(text)
+        self.init_regions()
+        self.trail.clear()
+        self.dirty_cells.update(range(self.topology.cells))
+        self.dirty_units.update(range(len(self.topology.units)))
 
     def init_grid(self, text):
-        num = np.reshape(np.array(list(map(lambda n: 0 if n == "." else int(n), text))), (9, 9))
-        self.grid = np.empty((9, 9), dtype=SudokuPoint)
-        for index, value in np.ndenumerate(self.grid):
-            self.grid[index] = SudokuPoint(index, {1, 2, 3, 4, 5, 6, 7, 8, 9})
-        for index, value in np.ndenumerate(num):
+        topology = self.topology
+        values = topology.cell_values(text)
+        digits = topology.intern(topology.digits)
+        self.points = tuple(SudokuPoint(index, digits, topology.size) for index in topology.indexes)
+        self.grid = dict(zip(topology.indexes, self.points))
+        # 已知数必须仍是所在格子的候选数, 否则是重复的已知数
+        for index, value in zip(topology.indexes, values):
             if value != 0:
-                if not self.set_point_value(index, value):
+                candidates = self.grid[index].candidates
+                if not candidates or value not in candidates or not self.set_point_value(index, value):
                     raise Exception("Invalid Sudoku!")
 
+    # 各区域都是格子的tuple, 只在创建时按topology表生成一次
+    def init_regions(self):
+        points = self.points
+        topology = self.topology
+        self.units = tuple(tuple(points[cell] for cell in unit) for unit in topology.units)
+        self.regions = tuple(self.units[unit] for unit in topology.region_order)
+        self.regions_without_blocks = tuple(region for i, region in enumerate(self.regions) if i % 3 != 2)
+        self.cell_units = tuple(tuple(self.units[unit] for unit in units) for units in topology.cell_units)
+
     def set_point_value(self, index, value):
         self.count += 1
         point = self.grid[index]
+        self.save_point(point)
         point.value = value
         point.candidates = None
         valid = True
-        for region in self.get_regions_by_index(index):
-            valid_state = self.discard_candidates(region, {value}, {index})
-            valid = valid and valid_state
+        points = self.points
+        intern = self.topology.intern
+        for peer in self.topology.peers[point.cell]:
+            peer_point = points[peer]
+            if peer_point.candidates and value in peer_point.candidates:
+                self.save_point(peer_point)
+                peer_point.candidates = intern(peer_point.candidates - {value})
+                if not peer_point.candidates:
+                    valid = False
         return valid
 
+    def set_candidates(self, index, candidates):
+        point = self.grid[index]
+        self.save_point(point)
+        point.candidates = self.topology.intern(candidates)
+
+    def save_point(self, point):
+        self.trail.append((point, point.value, point.candidates))
+        self.touch(point.cell)
+
+    def touch(self, cell):
+        self.dirty_cells.add(cell)
+        units = self.topology.cell_units[cell]
+        self.dirty_units.update(units)
+        generations = self.unit_generations
+        generation = self.generation
+        for unit in units:
+            generations[unit] = generation
+
+    # 撤销日志, rollback到mark时的状态
+    def mark(self):
+        return len(self.trail)
+
+    def rollback(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            point, value, candidates = trail.pop()
+            point.value = value
+            point.candidates = candidates
+            self.touch(point.cell)
+
+    # mark之后有变化的格子, 按第一次变化的顺序返回[(格子编号, 新填的数, 删掉的候选数)], 两者只有一个不为None
+    def changes_since(self, mark):
+        first = {}
+        for point, value, candidates in self.trail[mark:]:
+            first.setdefault(point.cell, (point, value, candidates))
+        changes = []
+        for cell, (point, value, candidates) in first.items():
+            if point.value and not value:
+                changes.append((cell, point.value, None))
+            elif candidates and point.candidates is not None and len(point.candidates) < len(candidates):
+                changes.append((cell, None, candidates - point.candidates))
+        return changes
+
+    # seen是Finder上次检查各区域时的版本号, 只返回之后有变化的区域
+    # 检查前先增加版本号, 检查过程中的修改会让该区域在下次重新被检查
+    def changed_units(self, seen, units):
+        self.generation += 1
+        generations = self.unit_generations
+        for unit in units:
+            generation = generations[unit]
+            if seen[unit] != generation:
+                seen[unit] = generation
+                yield unit
+
     def get_row(self, index):
-        return self.grid[index[0]]
+        return self.units[index[0]]
 
     def get_col(self, index):
-        return self.grid[:, index[1]]
+        return self.units[self.topology.size + index[1]]
 
     def get_block(self, index):
-        row, col = map(lambda x: int(x / 3) * 3, index)
-        return self.grid[row:row + 3, col:col + 3].flat
+        return self.units[2 * self.topology.size + self.get_block_num(index)]
+
+    def get_unit(self, unit):
+        return self.units[unit]
 
     def get_regions(self):
-        for i in range(0, 9):
-            yield self.grid[i]
-            yield self.grid[:, i]
-            row, col = int(i / 3) * 3, (i % 3) * 3
-            yield self.grid[row:row + 3, col:col + 3].flat
+        return self.regions
 
     def get_rows_and_cols(self):
-        for i in range(0, 9):
-            yield self.grid[i]
-            yield self.grid[:, i]
+        return self.regions_without_blocks
 
     def get_blocks(self):
-        for i in range(0, 9):
-            row, col = int(i / 3) * 3, (i % 3) * 3
-            yield self.grid[row:row + 3, col:col + 3].flat
+        return self.units[2 * self.topology.size:]
 
     def get_regions_by_index(self, index):
-        yield self.get_row(index)
-        yield self.get_col(index)
-        yield self.get_block(index)
+        return self.cell_units[index[0] * self.topology.size + index[1]]
 
     def get_regions_by_points(self, points):
         index = points[0].index
@@ -89,49 +199,63 @@ class Sudoku(object):
         valid = True
         for point in region:
             if point.candidates and point.index not in exclude_indexes:
-                point.candidates = point.candidates - candidates
-                if len(point.candidates) == 0:
+                remaining = point.candidates - candidates
+                if len(remaining) == len(point.candidates):
+                    continue
+                self.save_point(point)
+                point.candidates = self.topology.intern(remaining)
+                if len(remaining) == 0:
                     valid = False
         return valid
 
     def is_region_solved(self, region):
-        return len(reduce(lambda m, p: m.remove(p.value) or m, region, {1, 2, 3, 4, 5, 6, 7, 8, 9})) == 0
+        return len(reduce(lambda m, p: m.remove(p.value) or m, region, set(self.topology.digits))) == 0
 
     def is_all_set(self):
-        return all(map(lambda p: p.value, self.grid.flat))
+        return all(map(lambda p: p.value, self.points))
 
     def is_solved(self):
         return all(map(lambda r: self.is_region_solved(r), self.get_regions()))
 
     def is_same_row(self, points):
-        if len(points) <= 1:
-            return True
         row = points[0].index[0]
-        return all(map(lambda h: h.index[0] == row, points))
+        for point in points:
+            if point.index[0] != row:
+                return False
+        return True
 
     def is_same_col(self, points):
-        if len(points) <= 1:
-            return True
         col = points[0].index[1]
-        return all(map(lambda h: h.index[1] == col, points))
+        for point in points:
+            if point.index[1] != col:
+                return False
+        return True
 
     def get_block_num(self, index):
-        row, col = index
-        return int(row / 3) * 3 + int(col / 3)
+        return self.topology.block_of[index[0] * self.topology.size + index[1]]
 
     def is_same_block(self, points):
-        if len(points) <= 1:
-            return True
-        block_num = self.get_block_num(points[0].index)
-        return all(map(lambda p: self.get_block_num(p.index) == block_num, points))
+        block_of = self.topology.block_of
+        block_num = block_of[points[0].cell]
+        for point in points:
+            if block_of[point.cell] != block_num:
+                return False
+        return True
 
     def to_plain_text(self):
-        return "".join(list(map(lambda p: str(p.value) if p.value else '.', self.grid.flat)))
+        return self.topology.to_text(p.value for p in self.points)
 
+    # 和numpy打印二维数组的格式相同
     def print_grid_simple(self):
-        print(np.reshape(np.array(list(map(lambda p: p.value or 0, self.grid.flat))), (9, 9)))
+        size = self.topology.size
+        values = [str(p.value or 0) for p in self.points]
+        width = max(map(len, values))
+        rows = ("[" + " ".join(v.rjust(width) for v in values[i:i + size]) + "]" for i in range(0, len(values), size))
+        print("[" + "\n ".join(rows) + "]")
 
     def print_step(self, debug, name, index, value):
+        if self.hook is not None:
+            self.hook.on_step(self, name, index, value)
         if not debug:
             return
         print(name)
@@ -139,6 +263,8 @@ class Sudoku(object):
         print(f"{chr(y + 65)}{x + 1}\t{value}")
 
     def print_rollback(self, debug, index, value):
+        if self.hook is not None:
+            self.hook.on_rollback(self, index, value)
         if not debug:
             return
         print("Rollback")
@@ -146,44 +272,57 @@ class Sudoku(object):
         print(f"{chr(y + 65)}{x + 1}\t{value}")
         self.print_grid(debug)
 
+    def record_changes(self, name, mark):
+        if self.hook is not None:
+            self.hook.on_changes(self, name, mark)
+
     def print_grid(self, debug):
+        if self.hook is not None:
+            self.hook.on_grid(self)
         if not debug:
             return
-        result = np.full((27, 27), None, dtype=object)
-        for index, point in np.ndenumerate(self.grid):
-            y, x = index
+        # 每个格子占box x box个字符, 已填的格子画成方框, 未填的格子列出候选数
+        box, size, symbols = self.topology.box, self.topology.size, self.topology.symbols
+        width = size * box
+        edges = (0, box - 1)
+        filled = [['+' if i in edges and j in edges else '-' if i in edges else '|' if j in edges else None
+                   for j in range(box)] for i in range(box)]
+        result = [[None] * width for _ in range(width)]
+        for (y, x), point in zip(self.topology.indexes, self.points):
+            top, left = y * box, x * box
             if point.value:
-                result[y * 3:y * 3 + 3, x * 3:x * 3 + 3] = [
-                    ['+', '-', '+'],
-                    ['|', point.value, '|'],
-                    ['+', '-', '+'],
-                ]
+                for i in range(box):
+                    result[top + i][left:left + box] = filled[i]
+                result[top + box // 2][left + box // 2] = symbols[point.value - 1]
             else:
-                candidates = list(point.candidates)
-                block = result[y * 3:y * 3 + 3, x * 3:x * 3 + 3].flat
-                block[0:len(candidates)] = candidates
-
-        print("     [1] [2] [3]   [4] [5] [6]   [7] [8] [9]   ")
-        print("   + --- --- --- + --- --- --- + --- --- --- + ")
-        for y in range(0, 27):
-            if (y - 1) % 3 == 0:
-                c = chr(int((y - 1) / 3) + 65)
+                candidates = [symbols[n - 1] for n in sorted(point.candidates)]
+                for k, c in enumerate(candidates):
+                    result[top + k // box][left + k % box] = c
+
+        separator = "   + " + ("".join("-" * box + " " for _ in range(box)) + "+ ") * box
+        blank = "   | " + (" " * (box + 1) * box + "| ") * box
+        labels = ["".join(f"[{x + 1}]".ljust(box + 1) for x in range(i * box, (i + 1) * box)) for i in range(box)]
+        print("     " + "  ".join(labels) + "  ")
+        print(separator)
+        for y in range(0, width):
+            if y % box == box // 2:
+                c = chr(y // box + 65)
                 print(f"[{c}]", end="")
             else:
                 print("   ", end="")
-            for x in range(0, 27):
+            for x in range(0, width):
                 if x == 0:
                     print("| ", end="")
-                print(result[y, x] or ' ', end="")
-                if (x + 1) % 3 == 0:
+                print(result[y][x] or ' ', end="")
+                if (x + 1) % box == 0:
                     print(" ", end="")
-                if (x + 1) % 9 == 0:
+                if (x + 1) % size == 0:
                     print("| ", end="")
             print()
-            if (y + 1) % 9 == 0:
-                print("   + --- --- --- + --- --- --- + --- --- --- + ")
-            if (y + 1) % 3 == 0 and y != 26:
-                print("   |             |             |             | ")
+            if (y + 1) % size == 0:
+                print(separator)
+            if (y + 1) % box == 0 and y != width - 1:
+                print(blank)
 
 
 # 唯一候选数法
@@ -195,20 +334,16 @@ class UniqueCandidateFinder(object):
 
     # 1. 顺利解完, 不管有几个唯一解, 都返回True
     # 2. 发现空候选集, 说明无解, 返回False
+    # 只检查候选数有变化的格子, 直到没有新的变化
     def solve(self):
-        has_unique_solution = True
-        while has_unique_solution:
-            has_unique_solution = False
-            for index, point in np.ndenumerate(self.sudoku.grid):
-                if point.candidates:
-                    if len(point.candidates) == 0:
-                        return False
-                    if len(point.candidates) == 1:
-                        has_unique_solution = True
-                        self.sudoku.print_step(self.debug, self.name, index, point.candidates)
-                        self.sudoku.print_grid(self.debug)
-                        if not self.sudoku.set_point_value(index, list(point.candidates)[0]):
-                            return False
+        dirty_cells = self.sudoku.dirty_cells
+        while dirty_cells:
+            point = self.sudoku.points[dirty_cells.pop()]
+            if point.candidates and len(point.candidates) == 1:
+                self.sudoku.print_step(self.debug, self.name, point.index, point.candidates)
+                self.sudoku.print_grid(self.debug)
+                if not self.sudoku.set_point_value(point.index, next(iter(point.candidates))):
+                    return False
         return True
 
 
@@ -219,30 +354,40 @@ class ImplicitUniqueCandidateFinder(object):
         self.name = "OnlyCandidateFinder"
         self.debug = debug
 
-    def filter_only_candidate(self, current_point):
-        for block in self.sudoku.get_regions_by_index(current_point.index):
-            current_candidates = current_point.candidates.copy()
-            for point in block:
-                if point.candidates and point.index != current_point.index:
-                    for n in point.candidates:
-                        current_candidates.discard(n)
-            if len(current_candidates) == 1:
-                return list(current_candidates)[0]
-        return None
+    # 区域内只出现一次的候选数, 返回[(point, n)], 一个格子对应多个数时说明无解, 返回None
+    def filter_only_candidates(self, region):
+        seen = set()
+        repeated = set()
+        points = [point for point in region if point.candidates]
+        for point in points:
+            repeated |= seen & point.candidates
+            seen |= point.candidates
+        only = seen - repeated
+        if not only:
+            return []
+        result = []
+        for point in points:
+            candidates = point.candidates & only
+            if len(candidates) > 1:
+                return None
+            if candidates:
+                result.append((point, next(iter(candidates))))
+        return result
 
+    # 只检查有格子变化过的区域, 直到没有新的变化
     def solve(self):
-        has_unique_solution = True
-        while has_unique_solution:
-            has_unique_solution = False
-            for index, point in np.ndenumerate(self.sudoku.grid):
-                if point.candidates:
-                    candidate = self.filter_only_candidate(point)
-                    if candidate:
-                        has_unique_solution = True
-                        self.sudoku.print_step(self.debug, self.name, index, candidate)
-                        self.sudoku.print_grid(self.debug)
-                        if not self.sudoku.set_point_value(index, candidate):
-                            return False
+        dirty_units = self.sudoku.dirty_units
+        while dirty_units:
+            found = self.filter_only_candidates(self.sudoku.get_unit(dirty_units.pop()))
+            if found is None:
+                return False
+            for point, n in found:
+                if not point.candidates or n not in point.candidates:
+                    continue
+                self.sudoku.print_step(self.debug, self.name, point.index, n)
+                self.sudoku.print_grid(self.debug)
+                if not self.sudoku.set_point_value(point.index, n):
+                    return False
         return True
 
 
@@ -252,9 +397,12 @@ class BlockCandidateFinder(object):
         self.sudoku = sudoku
         self.name = "BlockCandidateFinder"
         self.debug = debug
+        self.seen = [-1] * len(sudoku.topology.units)
 
     def solve(self):
-        for block in self.sudoku.get_blocks():
+        box = self.sudoku.topology.box
+        for unit in self.sudoku.changed_units(self.seen, self.sudoku.topology.block_units):
+            block = self.sudoku.get_unit(unit)
             processed = {}
             for point in block:
                 if point.candidates:
@@ -262,7 +410,7 @@ class BlockCandidateFinder(object):
                         if n not in processed:
                             processed[n] = []
                         processed[n].append(point)
-            for n, points in filter(lambda e: 2 <= len(e[1]) <= 3, processed.items()):
+            for n, points in filter(lambda e: 2 <= len(e[1]) <= box, processed.items()):
                 if self.sudoku.is_same_row(points):
                     indexes = set(map(lambda p: p.index, points))
                     self.sudoku.print_step(self.debug, self.name, points[0].index, n)
@@ -282,9 +430,11 @@ class ImplicitDoubleCandidateFinder(object):
         self.sudoku = sudoku
         self.name = "ImplicitDoubleCandidateFinder"
         self.debug = debug
+        self.seen = [-1] * len(sudoku.topology.units)
 
     def solve(self):
-        for region in self.sudoku.get_regions():
+        for unit in self.sudoku.changed_units(self.seen, self.sudoku.topology.region_order):
+            region = self.sudoku.get_unit(unit)
             processed = {}
             for point in region:
                 if point.candidates:
@@ -300,7 +450,7 @@ class ImplicitDoubleCandidateFinder(object):
                         for index in entries[i][1]:
                             point = self.sudoku.grid[index]
                             if len(point.candidates) > 2:
-                                point.candidates = candidates
+                                self.sudoku.set_candidates(index, candidates)
         return True
 
 
@@ -310,6 +460,7 @@ class DoubleCandidateFinder(object):
         self.sudoku = sudoku
         self.name = "DoubleCandidateFinder"
         self.debug = debug
+        self.seen = [-1] * len(sudoku.topology.units)
 
     def find_pair_candidates(self, region):
         points = list(filter(lambda p: p.candidates and len(p.candidates) == 2, region))
@@ -328,8 +479,8 @@ class DoubleCandidateFinder(object):
         return None
 
     def solve(self):
-        for region in self.sudoku.get_regions():
-            pair = self.find_pair_candidates(region)
+        for unit in self.sudoku.changed_units(self.seen, self.sudoku.topology.region_order):
+            pair = self.find_pair_candidates(self.sudoku.get_unit(unit))
             if pair is not None:
                 indexes = set(map(lambda p: p.index, pair))
                 for r in self.sudoku.get_regions_by_points(pair):
@@ -344,6 +495,7 @@ class TripleCandidateFinder(object):
         self.sudoku = sudoku
         self.name = "TripleCandidateFinder"
         self.debug = debug
+        self.seen = [-1] * len(sudoku.topology.units)
 
     def find_triple_candidates(self, region):
         if len(list((filter(lambda p: p.candidates, region)))) < 4:
@@ -364,8 +516,8 @@ class TripleCandidateFinder(object):
         return None
 
     def solve(self):
-        for region in self.sudoku.get_rows_and_cols():
-            points = self.find_triple_candidates(region)
+        for unit in self.sudoku.changed_units(self.seen, self.sudoku.topology.row_col_order):
+            points = self.find_triple_candidates(self.sudoku.get_unit(unit))
             if points is not None:
                 indexes = set(map(lambda p: p.index, points))
                 for r in self.sudoku.get_regions_by_points(points):
@@ -384,6 +536,7 @@ class TripleCandidateFinder2(object):
         self.sudoku = sudoku
         self.name = "TripleCandidateFinder2"
         self.debug = debug
+        self.seen = [-1] * len(sudoku.topology.units)
 
     def find_triple_candidates(self, region):
         if len(list((filter(lambda p: p.candidates, region)))) < 4:
@@ -408,8 +561,8 @@ class TripleCandidateFinder2(object):
         return None
 
     def solve(self):
-        for region in self.sudoku.get_regions():
-            points = self.find_triple_candidates(region)
+        for unit in self.sudoku.changed_units(self.seen, self.sudoku.topology.region_order):
+            points = self.find_triple_candidates(self.sudoku.get_unit(unit))
             if points is not None:
                 indexes = set(map(lambda p: p.index, points))
                 for r in self.sudoku.get_regions_by_points(points):
@@ -428,6 +581,7 @@ class RectangleCandidateFinder(object):
         self.sudoku = sudoku
         self.name = "RectangleCandidateFinder"
         self.debug = False
+        self.seen = [-1] * len(sudoku.topology.units)
 
     def is_rectangle(self, points):
         p1, p2, p3, p4 = points
@@ -465,19 +619,23 @@ class RectangleCandidateFinder(object):
             return result
 
     def find_rectangle_candidates(self):
-        for i in range(0, 8):
+        size = self.sudoku.topology.size
+        for i in range(0, size - 1):
             row = self.sudoku.get_row((i, 0))
             for n, points in self.find_vertex(row):
                 if n is None:
                     continue
-                for j in range(i + 1, 9):
+                for j in range(i + 1, size):
                     row2 = self.sudoku.get_row((j, 0))
                     vertex = self.find_other_vertex(n, points, row2)
                     if vertex:
                         return n, vertex
         return None, None
 
+    # 矩形跨越多行, 只要有任何一行变化过就重新查找
     def solve(self):
+        if not list(self.sudoku.changed_units(self.seen, self.sudoku.topology.row_units)):
+            return True
         n, vertex = self.find_rectangle_candidates()
         if n is not None:
             p1, p2, p3, p4 = vertex
@@ -506,88 +664,517 @@ FINDERS = [
     ImplicitUniqueCandidateFinder,
 ]
 
+# 自适应模式的顺序, 由便宜到昂贵
+ADAPTIVE_FINDERS = list(dict.fromkeys(FINDERS))
+
+
+class FinderStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.elapsed_ns = 0
+        # 有变化的格子数, 即撤销日志增加的条目数
+        self.eliminations = 0
+
+    def __str__(self):
+        return f"{self.name}\t{self.calls} calls\t{self.elapsed_ns / 1e6:.1f}ms\t{self.eliminations} eliminations"
+
+
+# 按顺序反复运行各个Finder直到都没有进展, 并统计每个Finder的耗时和删减数
+# adaptive时, 任何Finder有进展就回到第一个Finder重新开始, 只有前面的Finder都没有进展时才运行后面的Finder
+# Finder对象在同一个数独的整个搜索过程中复用, 以便记住各自上次检查过的区域
+class FinderPipeline(object):
+    def __init__(self, finders=None, adaptive=False):
+        if finders is None:
+            finders = ADAPTIVE_FINDERS if adaptive else FINDERS
+        self.finders = list(finders)
+        self.adaptive = adaptive
+        self.stats = {finder_ctor.__name__: FinderStats(finder_ctor.__name__) for finder_ctor in self.finders}
+        self.instances = {}
+
+    def get_finder(self, finder_ctor, sudoku, debug):
+        finder = self.instances.get(finder_ctor)
+        if finder is None or finder.sudoku is not sudoku:
+            finder = sudoku.finder_overrides.get(finder_ctor, finder_ctor)(sudoku, debug)
+            self.instances[finder_ctor] = finder
+        return finder
+
+    # 返回运行后是否有进展, 无解时返回None
+    def run_finder(self, finder_ctor, sudoku, debug, metrics):
+        stats = self.stats[finder_ctor.__name__]
+        mark = len(sudoku.trail)
+        start = time.perf_counter_ns()
+        valid = self.get_finder(finder_ctor, sudoku, debug).solve()
+        stats.elapsed_ns += time.perf_counter_ns() - start
+        stats.calls += 1
+        eliminations = len(sudoku.trail) - mark
+        stats.eliminations += eliminations
+        if metrics is not None and eliminations:
+            metrics.eliminations[stats.name] = metrics.eliminations.get(stats.name, 0) + eliminations
+        if eliminations:
+            sudoku.record_changes(stats.name, mark)
+        if not valid:
+            return None
+        return len(sudoku.trail) > mark
+
+    # 1. 全部填完, 返回True
+    # 2. 无法继续, 返回False
+    # 3. 无解, 返回None
+    def run(self, sudoku, debug=False, metrics=None):
+        if sudoku.is_all_set():
+            return True
+        i = 0
+        changed = False
+        while i < len(self.finders):
+            progress = self.run_finder(self.finders[i], sudoku, debug, metrics)
+            if progress is None:
+                return None
+            if progress and sudoku.is_all_set():
+                return True
+            changed = changed or progress
+            i = 0 if progress and self.adaptive else i + 1
+            if i == len(self.finders) and changed:
+                i = 0
+                changed = False
+        return False
 
+    def __str__(self):
+        return "\n".join(str(stats) for stats in self.stats.values())
+
+
+# cell_order: first 候选数最少的第一个格子, degree 候选数相同时选未填邻格最多的格子
+# value_order: natural 按数字顺序, lcv 优先对邻格限制最少的数, constrained 优先在所在区域中位置最少的数
+# bilocal: 候选数多于2个时, 优先在某个数只剩两个位置的区域上分支
 class BestPointFinder(object):
-    def __init__(self, sudoku):
+    def __init__(self, sudoku, cell_order="first", value_order="natural", bilocal=False):
         self.sudoku = sudoku
         self.name = "BestPointFinder"
+        self.cell_order = cell_order
+        self.value_order = value_order
+        self.bilocal = bilocal
 
     def find(self):
-        best_index = None
-        best_candidates = np.zeros(10)
-        for index, point in np.ndenumerate(self.sudoku.grid):
+        best_points = []
+        best_count = None
+        for point in self.sudoku.points:
             if point.candidates:
-                if len(point.candidates) == 0:
-                    return index, []
-                if len(point.candidates) == 1:
-                    return index, point.candidates
-                if len(point.candidates) < len(best_candidates):
-                    best_index = index
-                    best_candidates = point.candidates
-        return best_index, best_candidates
+                count = len(point.candidates)
+                if count == 1:
+                    return point.index, point.candidates
+                if best_count is None or count < best_count:
+                    best_points = [point]
+                    best_count = count
+                elif count == best_count and self.cell_order == "degree":
+                    best_points.append(point)
+        if not best_points:
+            return None, []
+        best = best_points[0]
+        if len(best_points) > 1:
+            best = max(best_points, key=self.get_degree)
+        return best.index, best.candidates
+
+    def get_degree(self, point):
+        points = self.sudoku.points
+        return sum(1 for peer in self.sudoku.topology.peers[point.cell] if points[peer].candidates)
+
+    # 邻格中还有n这个候选数的格子数
+    def count_peer_candidates(self, point, n):
+        points = self.sudoku.points
+        peers = self.sudoku.topology.peers[point.cell]
+        return sum(1 for peer in peers if points[peer].candidates and n in points[peer].candidates)
+
+    # n在所在三个区域中最少还有几个位置
+    def count_positions(self, point, n):
+        return min(sum(1 for p in region if p.candidates and n in p.candidates)
+                   for region in self.sudoku.get_regions_by_index(point.index))
+
+    def order_values(self, index, candidates):
+        if self.value_order == "natural":
+            return sorted(candidates)
+        point = self.sudoku.grid[index]
+        if self.value_order == "lcv":
+            return sorted(candidates, key=lambda n: (self.count_peer_candidates(point, n), n))
+        if self.value_order == "constrained":
+            return sorted(candidates, key=lambda n: (self.count_positions(point, n), n))
+        raise Exception(f"Unknown value order: {self.value_order}")
+
+    # 某个数在区域中只剩两个位置时, 返回这两个分支
+    def find_bilocal(self):
+        for region in self.sudoku.get_regions():
+            positions = {}
+            for point in region:
+                if point.candidates:
+                    for n in point.candidates:
+                        positions.setdefault(n, []).append(point)
+            for n in sorted(positions):
+                if len(positions[n]) == 2:
+                    return [(point.index, n) for point in positions[n]]
+        return None
 
+    # 返回要依次尝试的(格子, 数字), 无解时为空
+    def find_branches(self):
+        index, candidates = self.find()
+        if len(candidates) > 2 and self.bilocal:
+            branches = self.find_bilocal()
+            if branches:
+                return branches
+        return [(index, n) for n in self.order_values(index, candidates)]
+
+
+# 分支策略名 -> BestPointFinder的参数
+BRANCHINGS = {
+    "first": {},
+    "degree": {"cell_order": "degree"},
+    "lcv": {"cell_order": "degree", "value_order": "lcv"},
+    "constrained": {"cell_order": "degree", "value_order": "constrained"},
+    "bilocal": {"cell_order": "degree", "value_order": "constrained", "bilocal": True},
+}
+
+
+# 单次求解的统计, 时间单位为纳秒
+class SolveMetrics(object):
+    def __init__(self):
+        self.nodes = 0
+        self.max_depth = 0
+        self.guesses = 0
+        self.backtracks = 0
+        # 冲突学习: 学到的nogood数, 因nogood跳过的分支数
+        self.learned = 0
+        self.pruned = 0
+        self.eliminations = {}
+        self.init_ns = 0
+        self.propagate_ns = 0
+        self.branch_ns = 0
+        self.learn_ns = 0
+        self.search_ns = 0
+
+    def enter(self, depth):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def as_dict(self):
+        return dict(self.__dict__, eliminations=dict(self.eliminations))
+
+
+class SolveAborted(Exception):
+    pass
+
+
+# 搜索的节点数和时间预算, dfs在每个节点检查, 超出时抛出SolveAborted
+class SearchBudget(object):
+    def __init__(self, node_limit=None, timeout=None):
+        self.node_limit = node_limit
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+
+    def check(self, nodes):
+        if self.node_limit is not None and nodes > self.node_limit:
+            raise SolveAborted(f"Node limit {self.node_limit} reached")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SolveAborted("Deadline exceeded")
+
+
+# 冲突学习时保存的nogood最多包含几个猜测
+MAX_NOGOOD = 3
+
+
+# 学到的nogood: 不能同时成立的一组(格子, 数字), 按其中每个(格子, 数字)建索引
+class NogoodStore(object):
+    def __init__(self):
+        self.nogoods = set()
+        self.by_literal = {}
+
+    def add(self, nogood):
+        nogood = frozenset(nogood)
+        if nogood in self.nogoods:
+            return False
+        self.nogoods.add(nogood)
+        for literal in nogood:
+            self.by_literal.setdefault(literal, []).append(nogood)
+        return True
+
+    # 给index填n之后, 是否有某个nogood的其余部分都已经成立
+    def blocks(self, sudoku, index, n):
+        grid = sudoku.grid
+        for nogood in self.by_literal.get((index, n), ()):
+            if all(i == index or grid[i].value == v for i, v in nogood):
+                return True
+        return False
 
+    # 除一个之外都已成立的nogood, 剩下的那个不能成立, 删去这个候选数; 有nogood全部成立时返回None
+    def propagate(self, sudoku):
+        grid = sudoku.grid
+        changed = False
+        for nogood in self.nogoods:
+            pending = None
+            for index, n in nogood:
+                point = grid[index]
+                if point.value == n:
+                    continue
+                if point.value or pending is not None or n not in point.candidates:
+                    break
+                pending = point, n
+            else:
+                if pending is None:
+                    return None
+                point, n = pending
+                sudoku.set_candidates(point.index, point.candidates - {n})
+                if not point.candidates:
+                    return None
+                changed = True
+        return changed
+
+    def __len__(self):
+        return len(self.nogoods)
+
+
+# 冲突学习时, 在另一个数独对象上只用删减技巧验证一组填数是否矛盾, 不影响搜索中的数独和Finder的状态
+# 这个数独对象在第一次需要时才创建, 不需要猜测的数独不用付出额外的初始化
+class ConflictChecker(object):
+    def __init__(self, text, sudoku_class, pipeline):
+        self.text = text
+        self.sudoku_class = sudoku_class
+        self.sudoku = None
+        self.pipeline = FinderPipeline(pipeline.finders, pipeline.adaptive)
+
+    def is_conflict(self, assignments):
+        if self.sudoku is None:
+            self.sudoku = self.sudoku_class(self.text)
+        sudoku = self.sudoku
+        mark = sudoku.mark()
+        try:
+            for index, n in assignments:
+                point = sudoku.grid[index]
+                if point.value:
+                    if point.value != n:
+                        return True
+                    continue
+                if n not in point.candidates or not sudoku.set_point_value(index, n):
+                    return True
+            return self.pipeline.run(sudoku) is None
+        finally:
+            sudoku.rollback(mark)
+
+    # 先找出仍然矛盾的最短的最近猜测序列, 再依次尝试去掉其中较早的猜测
+    # 超过max_size个猜测才矛盾时返回None, 这样的nogood很少再次成立, 不值得保存
+    def minimize(self, assignments, max_size):
+        for size in range(1, min(len(assignments), max_size) + 1):
+            nogood = list(assignments[-size:])
+            if self.is_conflict(nogood):
+                break
+        else:
+            return None
+        # 去掉最早的一个就不再矛盾(上一轮的检查), 所以它一定需要
+        i = 1
+        while i < len(nogood):
+            trial = nogood[:i] + nogood[i + 1:]
+            if self.is_conflict(trial):
+                nogood = trial
+            else:
+                i += 1
+        return nogood
+
+
+# learning: 冲突学习, 删减技巧发现矛盾时, 把当前路径上的猜测化简为nogood, 之后直接跳过会使某个nogood成立的分支
 class SudokuSolver(object):
-    def __init__(self, text):
-        self.sudoku = Sudoku(text)
+    def __init__(self, text, sudoku_class=Sudoku, pipeline=None, hook=None, branching="first", learning=False):
+        self.metrics = SolveMetrics()
+        start = time.perf_counter_ns()
+        self.sudoku = sudoku_class(text)
+        self.metrics.init_ns = time.perf_counter_ns() - start
+        self.sudoku.hook = hook
+        self.pipeline = pipeline or FinderPipeline()
+        self.branching = BRANCHINGS[branching]
+        self.budget = None
         self.guess_count = 0
+        self.solutions = []
         self.debug = False
+        self.nogoods = NogoodStore() if learning else None
+        self.checker = ConflictChecker(text, sudoku_class, self.pipeline) if learning else None
+        self.max_nogood = MAX_NOGOOD
+        # 当前路径上的猜测[(格子, 数字)]
+        self.decisions = []
 
     def solve_unique_solutions(self):
-        if self.sudoku.is_all_set():
+        start = time.perf_counter_ns()
+        state = self.pipeline.run(self.sudoku, self.debug, self.metrics)
+        self.metrics.propagate_ns += time.perf_counter_ns() - start
+        return state
+
+    def find_branches(self):
+        start = time.perf_counter_ns()
+        branches = BestPointFinder(self.sudoku, **self.branching).find_branches()
+        self.metrics.branch_ns += time.perf_counter_ns() - start
+        if len(branches) > 0:
+            self.sudoku.print_step(self.debug, "BestPointFinder", branches[0][0], [n for _, n in branches])
+            self.sudoku.print_grid(self.debug)
+            self.guess_count += 1
+            self.metrics.guesses += 1
+        return branches
+
+    def is_pruned(self, index, n):
+        if self.nogoods is not None and self.nogoods.blocks(self.sudoku, index, n):
+            self.metrics.pruned += 1
             return True
-        for finder_ctor in FINDERS:
-            finder = finder_ctor(self.sudoku, self.debug)
-            if not finder.solve():
-                return None
-            if self.sudoku.is_all_set():
-                return True
         return False
 
-    def dfs(self):
+    # 当前路径上的猜测导致了矛盾
+    def learn(self):
+        if self.checker is None or not self.decisions:
+            return
+        start = time.perf_counter_ns()
+        nogood = self.checker.minimize(self.decisions, self.max_nogood)
+        if nogood is not None and self.nogoods.add(nogood):
+            self.metrics.learned += 1
+        self.metrics.learn_ns += time.perf_counter_ns() - start
+
+    # 删减技巧没有进展时, 用学到的nogood继续删减, 返回值和FinderPipeline.run相同
+    def propagate_nogoods(self):
+        while True:
+            mark = self.sudoku.mark()
+            changed = self.nogoods.propagate(self.sudoku)
+            if changed is not False:
+                self.sudoku.record_changes("NogoodStore", mark)
+            if changed is None:
+                self.metrics.pruned += 1
+                return None
+            if not changed:
+                return False
+            state = self.solve_unique_solutions()
+            if state is not False:
+                return state
+
+    def dfs(self, depth=0):
+        self.metrics.enter(depth)
+        if self.budget is not None:
+            self.budget.check(self.metrics.nodes)
         state = self.solve_unique_solutions()
         if state is None:
+            self.learn()
             return False
+        if state is False and self.nogoods:
+            state = self.propagate_nogoods()
+            if state is None:
+                return False
         if state:
             return self.sudoku.is_solved()
-        index, candidates = BestPointFinder(self.sudoku).find()
-        if self.debug:
-            self.sudoku.print_step(self.debug, "BestPointFinder", index, candidates)
-            self.sudoku.print_grid(self.debug)
-
-        if len(candidates) == 0:
+        branches = self.find_branches()
+        if len(branches) == 0:
             return False
 
-        self.guess_count += 1
-        for n in candidates:
-            old = deepcopy(self.sudoku.grid)
+        for index, n in branches:
+            if self.is_pruned(index, n):
+                continue
+            mark = self.sudoku.mark()
+            self.decisions.append((index, n))
             valid = self.sudoku.set_point_value(index, n)
+            self.sudoku.record_changes("BestPointFinder", mark)
             if not valid:
-                self.sudoku.print_rollback(self.debug, index, n)
-                self.sudoku.grid = old
-                continue
-            if self.dfs():
+                self.learn()
+            elif self.dfs(depth + 1):
                 return True
+            self.decisions.pop()
+            self.metrics.backtracks += 1
             self.sudoku.print_rollback(self.debug, index, n)
-            self.sudoku.grid = old
+            self.sudoku.rollback(mark)
         return False
 
+    # 和dfs相同, 但找到解后继续搜索, 直到找到limit个解
+    def count_dfs(self, limit, depth=0):
+        self.metrics.enter(depth)
+        if self.budget is not None:
+            self.budget.check(self.metrics.nodes)
+        state = self.solve_unique_solutions()
+        if state is None:
+            self.learn()
+            return
+        if state is False and self.nogoods:
+            state = self.propagate_nogoods()
+            if state is None:
+                return
+        if state:
+            if self.sudoku.is_solved():
+                self.solutions.append(self.sudoku.to_plain_text())
+            return
+        branches = self.find_branches()
+        if len(branches) == 0:
+            return
+
+        for index, n in branches:
+            if self.is_pruned(index, n):
+                continue
+            mark = self.sudoku.mark()
+            self.decisions.append((index, n))
+            valid = self.sudoku.set_point_value(index, n)
+            self.sudoku.record_changes("BestPointFinder", mark)
+            if valid:
+                self.count_dfs(limit, depth + 1)
+            else:
+                self.learn()
+            self.decisions.pop()
+            self.metrics.backtracks += 1
+            self.sudoku.print_rollback(self.debug, index, n)
+            self.sudoku.rollback(mark)
+            if len(self.solutions) >= limit:
+                return
+
+    # node_limit/timeout(秒)超出时抛出SolveAborted
+    def search(self, node_limit=None, timeout=None):
+        self.budget = SearchBudget(node_limit, timeout) if node_limit or timeout else None
+        self.decisions = []
+        start = time.perf_counter_ns()
+        try:
+            return self.dfs()
+        finally:
+            self.metrics.search_ns += time.perf_counter_ns() - start
+
+    # 返回解的个数, 最多为limit, 找到的解保存在self.solutions, 数独本身恢复为初始状态
+    def count_solutions(self, limit=2, node_limit=None, timeout=None):
+        self.solutions = []
+        self.budget = SearchBudget(node_limit, timeout) if node_limit or timeout else None
+        self.decisions = []
+        start = time.perf_counter_ns()
+        mark = self.sudoku.mark()
+        try:
+            self.count_dfs(limit)
+        finally:
+            self.sudoku.rollback(mark)
+            self.metrics.search_ns += time.perf_counter_ns() - start
+        return len(self.solutions)
+
+    def has_unique_solution(self):
+        return self.count_solutions(2) == 1
+
+    def to_plain_text(self):
+        return self.sudoku.to_plain_text()
+
     def solve(self):
         self.sudoku.print_grid_simple()
-        start = time.time()
 
-        if not self.dfs():
+        if not self.search():
             raise Exception("Sudoku is wrong")
 
         print("\nAnswer:")
         self.sudoku.print_grid_simple()
-        end = time.time()
         print(f"Guess Count: {self.guess_count}")
         print(f"Point Count: {self.sudoku.count}")
-        print(f"Elapsed Time: {round(end - start, 2)}s")
+        print(f"Elapsed Time: {round(self.metrics.search_ns / 1e9, 2)}s")
         return self.sudoku.to_plain_text()
 
 
+ENGINES = ("finders", "dlx")
+
+
+# finders: 人工技巧+BestPointFinder猜测, dlx: 舞蹈链精确覆盖, 最坏情况耗时更稳定
+def create_solver(text, engine="finders"):
+    if engine == "finders":
+        return SudokuSolver(text)
+    if engine == "dlx":
+        from sudoku_dlx import DLXSolver
+        return DLXSolver(text)
+    raise Exception(f"Unknown engine: {engine}")
+
+
 if __name__ == '__main__':
     # test(SudokuSolver)
     SudokuSolver("..53.....8......2..7..1.5..4....53...1..7...6..32...8..6.5....9..4....3......97..").solve()
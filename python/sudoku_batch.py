@@ -0,0 +1,153 @@
+import argparse
+import itertools
+import os
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool
+
+from sudoku1 import ENGINES, create_solver
+from sudoku_topology import CELLS
+
+PUZZLE_CHARS = frozenset(".0123456789")
+
+
+class BatchStats(object):
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    def throughput(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"Solved {self.count - self.failed}/{self.count} puzzles "
+                f"in {self.elapsed:.2f}s ({self.throughput():.1f} puzzles/s)")
+
+
+# 无解或格式错误时返回None
+def solve_text(text, engine="finders"):
+    try:
+        solver = create_solver(text, engine)
+        if not solver.search():
+            return None
+    except Exception:
+        return None
+    return solver.to_plain_text()
+
+
+# 9x9数独文本, 只含数字和'.'
+def is_puzzle_text(text):
+    return len(text) == CELLS and PUZZLE_CHARS.issuperset(text)
+
+
+def read_puzzles(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def read_chunks(puzzles, chunksize):
+    puzzles = iter(puzzles)
+    while True:
+        chunk = list(itertools.islice(puzzles, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+# vectorized时每个chunk整批交给sudoku_vector.solve_batch
+def map_solve(pool, puzzles, chunksize, vectorized, engine):
+    if vectorized:
+        from sudoku_vector import solve_batch
+        func, puzzles, chunksize = partial(solve_batch, engine=engine), read_chunks(puzzles, chunksize), 1
+    else:
+        func = partial(solve_text, engine=engine)
+    results = map(func, puzzles) if pool is None else pool.imap(func, puzzles, chunksize)
+    if vectorized:
+        for chunk in results:
+            yield from chunk
+    else:
+        yield from results
+
+
+# 先查缓存, 每次取一段输入, 只把未命中且不重复的数独交给进程池
+def map_solve_cached(pool, puzzles, chunksize, vectorized, engine, cache, blocksize):
+    for block in read_chunks(puzzles, blocksize):
+        entries = [cache.lookup(text) for text in block]
+        misses = list(dict.fromkeys(text for text, (_, _, solution) in zip(block, entries) if solution is None))
+        solved = dict(zip(misses, map_solve(pool, misses, chunksize, vectorized, engine)))
+        for text, (key, transform, solution) in zip(block, entries):
+            if solution is None:
+                solution = solved[text]
+                if solution is not None:
+                    cache.store(key, transform, solution)
+            yield solution
+
+
+# 按输入顺序返回结果, workers为1时不启动进程池
+def solve_puzzles(puzzles, workers=None, chunksize=64, vectorized=False, cache=None, engine="finders"):
+    pool = None if workers == 1 else Pool(workers)
+    try:
+        if cache is None:
+            yield from map_solve(pool, puzzles, chunksize, vectorized, engine)
+        else:
+            blocksize = chunksize * (workers or os.cpu_count() or 1) * 4
+            yield from map_solve_cached(pool, puzzles, chunksize, vectorized, engine, cache, blocksize)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def solve_file(input_file, output_file, workers=None, chunksize=64, vectorized=False, cache=None, engine="finders"):
+    stats = BatchStats()
+    start = time.perf_counter()
+    for solution in solve_puzzles(read_puzzles(input_file), workers, chunksize, vectorized, cache, engine):
+        stats.count += 1
+        if solution is None:
+            stats.failed += 1
+            solution = ""
+        output_file.write(solution)
+        output_file.write("\n")
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a file of sudoku puzzles, one 81-character line each.")
+    parser.add_argument("input", help="puzzle file, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="solution file, '-' for stdout")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("-c", "--chunksize", type=int, default=64, help="puzzles sent to a worker at a time")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="finders", help="solving engine")
+    parser.add_argument("--vectorized", action="store_true", help="propagate singles over each chunk with numpy")
+    parser.add_argument("--cache-size", type=int, default=0, help="solution cache entries, 0 disables the cache")
+    parser.add_argument("--cache-file", default=None, help="load the cache from and save it to this file")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_size > 0:
+        from sudoku_cache import SolutionCache
+        cache = SolutionCache(args.cache_size, args.cache_file)
+
+    input_file = sys.stdin if args.input == "-" else open(args.input)
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        stats = solve_file(input_file, output_file, args.workers, args.chunksize, args.vectorized, cache, args.engine)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    print(stats, file=sys.stderr)
+    if cache is not None:
+        print(cache, file=sys.stderr)
+        if args.cache_file:
+            cache.save()
+    return 0 if stats.failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from sudoku1 import ADAPTIVE_FINDERS, BRANCHINGS, FinderPipeline, ImplicitUniqueCandidateFinder, SudokuSolver, \
+    UniqueCandidateFinder, create_solver
+from sudoku_bitmask import BitmaskSudoku
+from sudoku_topology import topology_for
+from sudoku_worker import WarmWorker
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPORA_DIR = os.path.join(BENCH_DIR, "corpora")
+WORKER = os.path.join(BENCH_DIR, "sudoku_worker.py")
+CORPORA = ("easy", "hard", "17clue")
+# --scaling时比较不同大小的数独, 大数独上只跑这几种配置
+SCALING_CORPORA = ("hard", "16x16", "25x25")
+SCALING_CONFIGS = ("finders", "adaptive", "bitmask", "dlx")
+
+# 配置名 -> 根据数独文本创建求解器的函数
+CONFIGS = {
+    "finders": lambda text: SudokuSolver(text),
+    "adaptive": lambda text: SudokuSolver(text, pipeline=FinderPipeline(ADAPTIVE_FINDERS, adaptive=True)),
+    "singles": lambda text: SudokuSolver(
+        text, pipeline=FinderPipeline([UniqueCandidateFinder, ImplicitUniqueCandidateFinder])),
+    "bitmask": lambda text: SudokuSolver(text, sudoku_class=BitmaskSudoku),
+    "learning": lambda text: SudokuSolver(text, learning=True),
+    "dlx": lambda text: create_solver(text, "dlx"),
+}
+# 各分支策略, 默认的first即为finders
+CONFIGS.update({
+    "branch-" + name: (lambda name: lambda text: SudokuSolver(text, branching=name))(name)
+    for name in BRANCHINGS if name != "first"
+})
+# 超过基准多少比例算性能退化
+REGRESSION_THRESHOLD = 0.1
+
+
+def load_corpus(name):
+    with open(os.path.join(CORPORA_DIR, name + ".txt")) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def is_valid_solution(puzzle, solution):
+    if len(solution) != len(puzzle) or any(p not in ".0" and p != s for p, s in zip(puzzle, solution)):
+        return False
+    return all(len(set(solution[cell] for cell in unit) - {"."}) == len(unit) for unit in topology_for(puzzle).units)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def solve_once(factory, text):
+    solver = factory(text)
+    solver.search()
+    return solver
+
+
+def measure_peak_memory(factory, puzzles):
+    peak = 0
+    for text in puzzles:
+        tracemalloc.start()
+        solve_once(factory, text)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peak
+
+
+# 同时保留所有数独的求解器时, 平均每个数独占用的内存, 先创建一个以排除共享表的初始化
+def measure_grid_memory(factory, puzzles):
+    factory(puzzles[0])
+    tracemalloc.start()
+    solvers = [factory(text) for text in puzzles]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(solvers)
+
+
+def run_benchmark(corpus, config, repeat=1, memory=True):
+    factory = CONFIGS[config]
+    puzzles = load_corpus(corpus)
+    latencies = []
+    guesses = []
+    nodes = []
+    solved = 0
+    for _ in range(repeat):
+        for text in puzzles:
+            start = time.perf_counter_ns()
+            solver = solve_once(factory, text)
+            latencies.append(time.perf_counter_ns() - start)
+            guesses.append(solver.guess_count)
+            nodes.append(solver.metrics.nodes)
+            solved += is_valid_solution(text, solver.to_plain_text())
+    total = sum(latencies) / 1e9
+    return {
+        "corpus": corpus,
+        "config": config,
+        "cells": len(puzzles[0]),
+        "puzzles": len(latencies),
+        "solved": solved,
+        "puzzles_per_sec": len(latencies) / total if total else 0.0,
+        "p50_ms": percentile(latencies, 0.5) / 1e6,
+        "p99_ms": percentile(latencies, 0.99) / 1e6,
+        "mean_guesses": sum(guesses) / len(guesses),
+        "max_guesses": max(guesses),
+        "mean_nodes": sum(nodes) / len(nodes),
+        "peak_memory_kb": measure_peak_memory(factory, puzzles) / 1024 if memory else None,
+        "grid_memory_kb": measure_grid_memory(factory, puzzles) / 1024 if memory else None,
+    }
+
+
+# 多次运行子进程, 返回耗时的中位数(毫秒)
+def time_command(command, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        subprocess.run(command, stdout=subprocess.DEVNULL, cwd=BENCH_DIR, check=True)
+        times.append(time.perf_counter_ns() - start)
+    return percentile(times, 0.5) / 1e6
+
+
+# 短进程的启动开销: 空解释器, 只导入求解器, 冷启动解一个简单数独, 以及常驻worker的单次往返
+def measure_startup(repeat=5):
+    text = load_corpus("easy")[0]
+    with WarmWorker() as worker:
+        worker.solve(text)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            worker.solve(text)
+            times.append(time.perf_counter_ns() - start)
+    return {
+        "interpreter_ms": time_command([sys.executable, "-c", "pass"], repeat),
+        "import_ms": time_command([sys.executable, "-c", "import sudoku1"], repeat),
+        "cold_solve_ms": time_command([sys.executable, WORKER, text], repeat),
+        "warm_solve_ms": percentile(times, 0.5) / 1e6,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_all(corpora=CORPORA, configs=tuple(CONFIGS), repeat=1, memory=True, startup=True):
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "startup": measure_startup() if startup else None,
+        "results": [run_benchmark(corpus, config, repeat, memory) for corpus in corpora for config in configs],
+    }
+
+
+# 和基准结果比较, 返回退化的条目
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    old = {(r["corpus"], r["config"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        base = old.get((result["corpus"], result["config"]))
+        if base is None:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + threshold) or result["solved"] < base["solved"]:
+            regressions.append((result, base))
+    return regressions
+
+
+def print_report(report, file=sys.stderr):
+    print(f"{'corpus':8} {'config':18} {'solved':>9} {'puzzles/s':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'guesses':>8} {'nodes':>8} {'peak KB':>9} {'grid KB':>9}", file=file)
+    for r in report["results"]:
+        memory = f"{r['peak_memory_kb']:9.0f}" if r["peak_memory_kb"] is not None else f"{'-':>9}"
+        grid = f"{r['grid_memory_kb']:9.1f}" if r.get("grid_memory_kb") is not None else f"{'-':>9}"
+        nodes = f"{r['mean_nodes']:8.1f}" if "mean_nodes" in r else f"{'-':>8}"
+        print(f"{r['corpus']:8} {r['config']:18} {r['solved']:>4}/{r['puzzles']:<4} {r['puzzles_per_sec']:10.1f} "
+              f"{r['p50_ms']:9.2f} {r['p99_ms']:9.2f} {r['mean_guesses']:8.1f} {nodes} {memory} {grid}", file=file)
+    # 冲突学习和普通dfs(finders)访问的节点数对比
+    results = {(r["corpus"], r["config"]): r for r in report["results"]}
+    for (corpus, config), r in results.items():
+        plain = results.get((corpus, "finders"))
+        if config == "learning" and plain and plain.get("mean_nodes"):
+            change = (r["mean_nodes"] / plain["mean_nodes"] - 1) * 100
+            print(f"Learning on {corpus}: {plain['mean_nodes']:.1f} -> {r['mean_nodes']:.1f} nodes ({change:+.0f}%)",
+                  file=file)
+    startup = report.get("startup")
+    if startup:
+        print(f"Startup: interpreter {startup['interpreter_ms']:.1f}ms, import {startup['import_ms']:.1f}ms, "
+              f"cold solve {startup['cold_solve_ms']:.1f}ms, warm solve {startup['warm_solve_ms']:.1f}ms", file=file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sudoku engines and finder configurations.")
+    parser.add_argument("--corpus", nargs="+", choices=CORPORA + SCALING_CORPORA[1:], default=None)
+    parser.add_argument("--config", nargs="+", choices=list(CONFIGS), default=None)
+    parser.add_argument("--scaling", action="store_true", help="compare 9x9, 16x16 and 25x25 grids")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over each corpus")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory pass")
+    parser.add_argument("--no-startup", action="store_true", help="skip the subprocess startup measurements")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 on p50 regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    corpora = args.corpus or (SCALING_CORPORA if args.scaling else CORPORA)
+    configs = args.config or (SCALING_CONFIGS if args.scaling else tuple(CONFIGS))
+    report = run_all(corpora, configs, args.repeat, not args.no_memory, not args.no_startup)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        for result, base in regressions:
+            print(f"Regression: {result['corpus']}/{result['config']} p50 {base['p50_ms']:.2f}ms -> "
+                  f"{result['p50_ms']:.2f}ms, solved {base['solved']} -> {result['solved']}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
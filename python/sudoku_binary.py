@@ -0,0 +1,198 @@
+import argparse
+import os
+import struct
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+from sudoku1 import ENGINES
+from sudoku_batch import BatchStats, is_puzzle_text, read_chunks, read_puzzles
+from sudoku_topology import BOX, CELLS
+from sudoku_vector import parse, solve_values, to_text
+
+# 文件头: 魔数, 版本, 布局, 宫的边长, 格子数, 保留
+HEADER = struct.Struct("<4sBBBxI4x")
+MAGIC = b"SDKG"
+VERSION = 1
+# bytes: 每格一个字节(数字0-9), 可以直接映射为(N, 81)数组; packed: 每格4位, 高4位在前
+LAYOUTS = ("bytes", "packed")
+
+
+def record_size(layout):
+    return CELLS if layout == "bytes" else (CELLS + 1) // 2
+
+
+def pack(values):
+    values = np.asarray(values, dtype=np.uint8)
+    if CELLS % 2:
+        values = np.concatenate([values, np.zeros((len(values), 1), dtype=np.uint8)], axis=1)
+    return values[:, 0::2] << 4 | values[:, 1::2]
+
+
+def unpack(records):
+    values = np.empty((len(records), records.shape[1] * 2), dtype=np.int8)
+    values[:, 0::2] = records >> 4
+    values[:, 1::2] = records & 0x0F
+    return values[:, :CELLS]
+
+
+def read_header(file):
+    data = file.read(HEADER.size)
+    if len(data) != HEADER.size:
+        raise Exception("Invalid grid file!")
+    magic, version, layout, box, cells = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION or layout >= len(LAYOUTS) or box != BOX or cells != CELLS:
+        raise Exception("Invalid grid file!")
+    return LAYOUTS[layout]
+
+
+# 只读映射整个文件, 返回(layout, (N, 记录长度)的uint8数组)
+def open_grids(path):
+    with open(path, "rb") as file:
+        layout = read_header(file)
+    size = record_size(layout)
+    count = (os.path.getsize(path) - HEADER.size) // size
+    if count == 0:
+        return layout, np.zeros((0, size), dtype=np.uint8)
+    return layout, np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER.size, shape=(count, size))
+
+
+# 记录 -> (N, 81)的数字, bytes布局时是文件映射的视图, 不复制
+def to_values(records, layout):
+    return records.view(np.int8) if layout == "bytes" else unpack(records)
+
+
+def read_values(path, start=0, stop=None):
+    layout, records = open_grids(path)
+    return to_values(records[start:stop], layout)
+
+
+# 追加写入, 文件已存在时检查文件头, 新文件先写文件头
+class GridWriter(object):
+    def __init__(self, path, layout="bytes"):
+        if layout not in LAYOUTS:
+            raise Exception(f"Unknown layout: {layout}")
+        self.path = path
+        self.layout = layout
+        self.count = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as file:
+                if read_header(file) != layout:
+                    raise Exception(f"Layout of {path} is not {layout}")
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(HEADER.pack(MAGIC, VERSION, LAYOUTS.index(layout), BOX, CELLS))
+
+    def write(self, values):
+        values = np.asarray(values, dtype=np.uint8)
+        records = values if self.layout == "bytes" else pack(values)
+        self.file.write(np.ascontiguousarray(records).tobytes())
+        self.count += len(values)
+
+    # 只接受9x9数独文本, 有一行不合法时整批都不写入
+    def write_texts(self, texts):
+        for i, text in enumerate(texts):
+            if not is_puzzle_text(text):
+                raise Exception(f"Invalid Sudoku at puzzle {self.count + i + 1}!")
+        self.write(parse(texts))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# 在worker进程中各自映射输入文件, 只传递下标区间, 不需要序列化数独
+def solve_range(path, engine, bounds):
+    return solve_values(read_values(path, *bounds), engine)
+
+
+def solve_grid_file(input_path, output_path, layout=None, workers=None, chunksize=4096, engine="finders"):
+    stats = BatchStats()
+    start = time.perf_counter()
+    input_layout, records = open_grids(input_path)
+    bounds = [(i, min(i + chunksize, len(records))) for i in range(0, len(records), chunksize)]
+    func = partial(solve_range, input_path, engine)
+    pool = None if workers == 1 else Pool(workers)
+    try:
+        with GridWriter(output_path, layout or input_layout) as writer:
+            for solutions in map(func, bounds) if pool is None else pool.imap(func, bounds):
+                writer.write(solutions)
+                stats.count += len(solutions)
+                stats.failed += int((solutions[:, 0] == 0).sum())
+    finally:
+        if pool is not None:
+            pool.terminate()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def pack_text_file(input_file, output_path, layout="bytes", chunksize=4096):
+    with GridWriter(output_path, layout) as writer:
+        for chunk in read_chunks(read_puzzles(input_file), chunksize):
+            writer.write_texts(chunk)
+        return writer.count
+
+
+def unpack_to_text_file(input_path, output_file, chunksize=4096):
+    layout, records = open_grids(input_path)
+    for i in range(0, len(records), chunksize):
+        for row in to_values(records[i:i + chunksize], layout):
+            output_file.write(to_text(row))
+            output_file.write("\n")
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and solve sudoku grids in the binary grid format.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_parser = commands.add_parser("pack", help="text puzzles -> grid file")
+    pack_parser.add_argument("input", help="puzzle file, '-' for stdin")
+    pack_parser.add_argument("output")
+    pack_parser.add_argument("-l", "--layout", choices=LAYOUTS, default="bytes")
+    unpack_parser = commands.add_parser("unpack", help="grid file -> text puzzles")
+    unpack_parser.add_argument("input")
+    unpack_parser.add_argument("-o", "--output", default="-", help="text file, '-' for stdout")
+    solve_parser = commands.add_parser("solve", help="solve a grid file, appending solutions to another")
+    solve_parser.add_argument("input")
+    solve_parser.add_argument("output")
+    solve_parser.add_argument("-l", "--layout", choices=LAYOUTS, default=None, help="default: same as input")
+    solve_parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    solve_parser.add_argument("-c", "--chunksize", type=int, default=4096, help="grids mapped by a worker at a time")
+    solve_parser.add_argument("-e", "--engine", choices=ENGINES, default="finders", help="engine for unsolved grids")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        input_file = sys.stdin if args.input == "-" else open(args.input)
+        try:
+            print(f"Packed {pack_text_file(input_file, args.output, args.layout)} grids", file=sys.stderr)
+        except Exception as e:
+            print(f"{args.input}: {e}", file=sys.stderr)
+            return 1
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+    elif args.command == "unpack":
+        output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+        try:
+            unpack_to_text_file(args.input, output_file)
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+    else:
+        stats = solve_grid_file(args.input, args.output, args.layout, args.workers, args.chunksize, args.engine)
+        print(stats, file=sys.stderr)
+        return 0 if stats.failed == 0 else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,277 @@
+from sudoku1 import ImplicitDoubleCandidateFinder, ImplicitUniqueCandidateFinder, RectangleCandidateFinder, Sudoku, \
+    UniqueCandidateFinder
+
+
+# 候选数保存在BitmaskSudoku.masks中, 这里只是给各个Finder使用的视图
+class BitmaskPoint(object):
+    __slots__ = ("sudoku", "cell", "index")
+
+    def __init__(self, sudoku, cell):
+        self.sudoku = sudoku
+        self.cell = cell
+        self.index = sudoku.topology.indexes[cell]
+
+    @property
+    def value(self):
+        return self.sudoku.values[self.cell] or None
+
+    @property
+    def candidates(self):
+        sudoku = self.sudoku
+        if sudoku.values[self.cell]:
+            return None
+        return sudoku.mask_sets[sudoku.masks[self.cell]]
+
+    @candidates.setter
+    def candidates(self, candidates):
+        self.sudoku.set_candidates(self.index, candidates)
+
+    def get_key(self):
+        return self.sudoku.masks[self.cell]
+
+
+# 唯一候选数法, 直接检查掩码是否只有一位, 不经过BitmaskPoint
+class BitmaskUniqueCandidateFinder(UniqueCandidateFinder):
+    def solve(self):
+        sudoku = self.sudoku
+        dirty_cells = sudoku.dirty_cells
+        masks = sudoku.masks
+        indexes = sudoku.topology.indexes
+        while dirty_cells:
+            cell = dirty_cells.pop()
+            mask = masks[cell]
+            if mask and not mask & (mask - 1):
+                sudoku.print_step(self.debug, self.name, indexes[cell], sudoku.mask_sets[mask])
+                sudoku.print_grid(self.debug)
+                if not sudoku.assign(cell, mask.bit_length()):
+                    return False
+        return True
+
+
+# 隐性唯一候选数法, 区域内只出现一次的候选数用掩码的或运算求出
+class BitmaskImplicitUniqueCandidateFinder(ImplicitUniqueCandidateFinder):
+    def solve(self):
+        sudoku = self.sudoku
+        dirty_units = sudoku.dirty_units
+        masks = sudoku.masks
+        units = sudoku.topology.units
+        indexes = sudoku.topology.indexes
+        while dirty_units:
+            unit = units[dirty_units.pop()]
+            seen = repeated = 0
+            for cell in unit:
+                mask = masks[cell]
+                repeated |= seen & mask
+                seen |= mask
+            only = seen & ~repeated
+            if not only:
+                continue
+            found = []
+            for cell in unit:
+                mask = masks[cell] & only
+                if mask:
+                    if mask & (mask - 1):
+                        return False
+                    found.append((cell, mask))
+            for cell, bit in found:
+                if not masks[cell] & bit:
+                    continue
+                n = bit.bit_length()
+                sudoku.print_step(self.debug, self.name, indexes[cell], n)
+                sudoku.print_grid(self.debug)
+                if not sudoku.assign(cell, n):
+                    return False
+        return True
+
+
+# 区域内每个候选数所在位置的掩码(第i个格子为第i位)
+# 和ImplicitDoubleCandidateFinder一样按格子顺序和候选数集合的迭代顺序插入, 保证删减的顺序相同
+def unit_positions(sudoku, cells):
+    masks = sudoku.masks
+    mask_sets = sudoku.mask_sets
+    positions = {}
+    for i, cell in enumerate(cells):
+        mask = masks[cell]
+        if mask:
+            for n in mask_sets[mask]:
+                positions[n] = positions.get(n, 0) | 1 << i
+    return positions
+
+
+# 掩码中正好有两位
+def is_pair(mask):
+    rest = mask & (mask - 1)
+    return rest and not rest & (rest - 1)
+
+
+# 掩码中多于两位
+def has_more_than_two(mask):
+    rest = mask & (mask - 1)
+    return rest & (rest - 1)
+
+
+# 隐性候选数对删减法, 两个数的位置掩码相同且只有两个位置时, 这两个格子只保留这两个数
+class BitmaskImplicitDoubleCandidateFinder(ImplicitDoubleCandidateFinder):
+    def solve(self):
+        sudoku = self.sudoku
+        masks = sudoku.masks
+        bits = sudoku.topology.bits
+        units = sudoku.topology.units
+        for unit in sudoku.changed_units(self.seen, sudoku.topology.region_order):
+            cells = units[unit]
+            entries = [(n, positions) for n, positions in unit_positions(sudoku, cells).items() if is_pair(positions)]
+            for i in range(0, len(entries) - 1):
+                for j in range(i + 1, len(entries)):
+                    if entries[i][1] == entries[j][1]:
+                        pair = bits[entries[i][0]] | bits[entries[j][0]]
+                        positions = entries[i][1]
+                        for k, cell in enumerate(cells):
+                            if positions >> k & 1 and has_more_than_two(masks[cell]):
+                                sudoku.set_mask(cell, pair)
+        return True
+
+
+# 候选数矩形删减法, 查找顶点时直接读掩码
+class BitmaskRectangleCandidateFinder(RectangleCandidateFinder):
+    # 和RectangleCandidateFinder一样按候选数集合的迭代顺序查找, 保证找到同一个矩形
+    def find_vertex(self, row):
+        masks = self.sudoku.masks
+        mask_sets = self.sudoku.mask_sets
+        processed = {}
+        for point in row:
+            mask = masks[point.cell]
+            if mask:
+                for n in mask_sets[mask]:
+                    processed.setdefault(n, []).append(point)
+        for n, points in processed.items():
+            if len(points) == 2:
+                yield n, points
+
+    def find_other_vertex(self, target, vertex, row):
+        masks = self.sudoku.masks
+        bit = self.sudoku.topology.bits[target]
+        result = [point for point in row if masks[point.cell] & bit]
+        if len(result) != 2:
+            return None
+        result = sorted([vertex[0].index, vertex[1].index, result[0].index, result[1].index])
+        if self.is_rectangle(result):
+            return result
+
+
+# 大数独的候选数也是一个整数, 625格的数独每格25位
+# 调用最多的几个Finder换成直接读写掩码的实现, 其余的Finder通过BitmaskPoint访问
+class BitmaskSudoku(Sudoku):
+    finder_overrides = {
+        UniqueCandidateFinder: BitmaskUniqueCandidateFinder,
+        ImplicitUniqueCandidateFinder: BitmaskImplicitUniqueCandidateFinder,
+        ImplicitDoubleCandidateFinder: BitmaskImplicitDoubleCandidateFinder,
+        RectangleCandidateFinder: BitmaskRectangleCandidateFinder,
+    }
+
+    def init_grid(self, text):
+        topology = self.topology
+        self.mask_sets = topology.mask_sets
+        self.values = [0] * topology.cells
+        self.masks = [topology.full_mask] * topology.cells
+        self.points = tuple(BitmaskPoint(self, cell) for cell in range(topology.cells))
+        self.grid = dict(zip(topology.indexes, self.points))
+        for cell, n in enumerate(topology.cell_values(text)):
+            if n != 0:
+                if not self.masks[cell] & topology.bits[n] or not self.assign(cell, n):
+                    raise Exception("Invalid Sudoku!")
+
+    def assign(self, cell, value):
+        self.count += 1
+        values = self.values
+        masks = self.masks
+        trail = self.trail
+        dirty_cells = self.dirty_cells
+        dirty_units = self.dirty_units
+        generations = self.unit_generations
+        generation = self.generation
+        cell_units = self.topology.cell_units
+        trail.append((cell, values[cell], masks[cell]))
+        dirty_units.update(cell_units[cell])
+        for unit in cell_units[cell]:
+            generations[unit] = generation
+        values[cell] = value
+        masks[cell] = 0
+        bit = self.topology.bits[value]
+        valid = True
+        for peer in self.topology.peers[cell]:
+            mask = masks[peer]
+            if mask & bit:
+                trail.append((peer, 0, mask))
+                dirty_cells.add(peer)
+                dirty_units.update(cell_units[peer])
+                for unit in cell_units[peer]:
+                    generations[unit] = generation
+                mask &= ~bit
+                masks[peer] = mask
+                if not mask:
+                    valid = False
+        return valid
+
+    def set_point_value(self, index, value):
+        row, col = index
+        return self.assign(row * self.topology.size + col, value)
+
+    def discard_candidates(self, region, candidates, exclude_indexes):
+        bits = self.topology.to_mask(candidates)
+        masks = self.masks
+        valid = True
+        for point in region:
+            cell = point.cell
+            mask = masks[cell]
+            if mask & bits and point.index not in exclude_indexes:
+                self.trail.append((cell, 0, mask))
+                self.touch(cell)
+                mask &= ~bits
+                masks[cell] = mask
+                if not mask:
+                    valid = False
+        return valid
+
+    def set_candidates(self, index, candidates):
+        row, col = index
+        self.set_mask(row * self.topology.size + col, self.topology.to_mask(candidates))
+
+    def set_mask(self, cell, mask):
+        self.trail.append((cell, self.values[cell], self.masks[cell]))
+        self.touch(cell)
+        self.masks[cell] = mask
+
+    def rollback(self, mark):
+        trail = self.trail
+        values = self.values
+        masks = self.masks
+        while len(trail) > mark:
+            cell, value, mask = trail.pop()
+            values[cell] = value
+            masks[cell] = mask
+            self.touch(cell)
+
+    def changes_since(self, mark):
+        first = {}
+        for cell, value, mask in self.trail[mark:]:
+            first.setdefault(cell, (value, mask))
+        values = self.values
+        masks = self.masks
+        changes = []
+        for cell, (value, mask) in first.items():
+            if values[cell] and not value:
+                changes.append((cell, values[cell], None))
+            elif not values[cell] and mask & ~masks[cell]:
+                changes.append((cell, None, self.mask_sets[mask & ~masks[cell]]))
+        return changes
+
+    def is_all_set(self):
+        return all(self.values)
+
+    def is_solved(self):
+        values = self.values
+        topology = self.topology
+        return all(topology.to_mask(values[cell] for cell in unit) == topology.full_mask for unit in topology.units)
+
+    def to_plain_text(self):
+        return self.topology.to_text(self.values)
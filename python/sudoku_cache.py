@@ -0,0 +1,211 @@
+import itertools
+import math
+import os
+from collections import Counter, OrderedDict
+
+from sudoku_batch import is_puzzle_text, solve_text
+from sudoku_topology import BOX, SIZE
+
+DIGIT_CHARS = "".join(map(str, range(1, SIZE + 1)))
+# 每个方向最多展开的行(列)顺序数, 超过时只取排序后的第一个顺序, 只会降低命中率, 不影响结果
+MAX_LINE_ORDERS = 8
+REFINE_ROUNDS = 2
+
+
+def to_rows(text):
+    text = text.replace("0", ".")
+    return [text[row * SIZE:(row + 1) * SIZE] for row in range(SIZE)]
+
+
+def transpose(rows):
+    return ["".join(row[col] for row in rows) for col in range(SIZE)]
+
+
+# 行的不变量: 按宫分组的(所在列的不变量, 数字出现次数), 组内和组间都排序, 与列变换和数字编号无关
+def line_keys(rows, keys, cross_keys, counts):
+    result = []
+    for row, key in zip(rows, keys):
+        stacks = []
+        for s in range(BOX):
+            cols = range(s * BOX, (s + 1) * BOX)
+            stacks.append(tuple(sorted((cross_keys[c], counts[row[c]]) for c in cols if row[c] != ".")))
+        result.append((key, tuple(sorted(stacks))))
+    return result
+
+
+# 行和列的不变量交替细化几轮, 减少需要展开的相同不变量
+def refine_keys(rows):
+    cols = transpose(rows)
+    counts = Counter("".join(rows))
+    row_keys = col_keys = [()] * SIZE
+    for _ in range(REFINE_ROUNDS):
+        row_keys, col_keys = line_keys(rows, row_keys, col_keys, counts), line_keys(cols, col_keys, row_keys, counts)
+    return row_keys, col_keys
+
+
+# 按key排序, key相同的元素展开所有排列, 返回排列个数和排列列表
+def tie_permutations(items, key):
+    items = sorted(items, key=key)
+    groups = [list(group) for _, group in itertools.groupby(items, key=key)]
+    count = math.prod(math.factorial(len(group)) for group in groups)
+    perms = itertools.product(*(itertools.permutations(group) for group in groups))
+    return count, [sum(perm, ()) for perm in perms]
+
+
+# 按不变量排序后的所有行顺序, 只展开不变量相同的行和行组
+def line_orders(keys):
+    bands = []
+    total = 1
+    for band in range(BOX):
+        lines = range(band * BOX, (band + 1) * BOX)
+        count, perms = tie_permutations(lines, keys.__getitem__)
+        bands.append((sorted(keys[i] for i in lines), perms))
+        total *= count
+    count, band_perms = tie_permutations(range(BOX), lambda b: bands[b][0])
+    total *= count
+    if total > MAX_LINE_ORDERS:
+        band_perms = band_perms[:1]
+        bands = [(key, perms[:1]) for key, perms in bands]
+    orders = []
+    for band_perm in band_perms:
+        for choice in itertools.product(*(bands[b][1] for b in band_perm)):
+            orders.append(sum(choice, ()))
+    return orders
+
+
+# 按出现顺序把数字重新编号为1..9
+def relabel(chars):
+    mapping = {}
+    result = []
+    for ch in chars:
+        if ch != ".":
+            if ch not in mapping:
+                mapping[ch] = DIGIT_CHARS[len(mapping)]
+            ch = mapping[ch]
+        result.append(ch)
+    return "".join(result), mapping
+
+
+def complete_mapping(mapping):
+    unused = iter(sorted(set(DIGIT_CHARS) - set(mapping.values())))
+    mapping = dict(mapping)
+    for ch in DIGIT_CHARS:
+        if ch not in mapping:
+            mapping[ch] = next(unused)
+    return mapping
+
+
+# 返回(key, transform), key是所有候选变换中最小的字符串
+# transform = (是否转置, 行顺序, 列顺序, 数字映射)
+def canonicalize(text):
+    best = None
+    for transposed in (False, True):
+        rows = to_rows(text)
+        if transposed:
+            rows = transpose(rows)
+        row_keys, col_keys = refine_keys(rows)
+        col_orders = line_orders(col_keys)
+        for row_order in line_orders(row_keys):
+            for col_order in col_orders:
+                key, mapping = relabel([rows[r][c] for r in row_order for c in col_order])
+                if best is None or key < best[0]:
+                    best = key, (transposed, row_order, col_order, mapping)
+    key, (transposed, row_order, col_order, mapping) = best
+    return key, (transposed, row_order, col_order, complete_mapping(mapping))
+
+
+def apply_transform(text, transform):
+    transposed, row_order, col_order, mapping = transform
+    rows = to_rows(text)
+    if transposed:
+        rows = transpose(rows)
+    return "".join(mapping.get(rows[r][c], ".") for r in row_order for c in col_order)
+
+
+def invert_transform(text, transform):
+    transposed, row_order, col_order, mapping = transform
+    inverse = {v: k for k, v in mapping.items()}
+    rows = [["."] * SIZE for _ in range(SIZE)]
+    for i, r in enumerate(row_order):
+        for j, c in enumerate(col_order):
+            rows[r][c] = inverse.get(text[i * SIZE + j], ".")
+    rows = ["".join(row) for row in rows]
+    if transposed:
+        rows = transpose(rows)
+    return "".join(rows)
+
+
+# 以标准形式为key的LRU解缓存, 行列置换/转置/数字重编号后的数独共用同一个条目
+class SolutionCache(object):
+    def __init__(self, max_size=100000, path=None):
+        self.max_size = max_size
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # 返回(key, transform, solution), 未命中时solution为None, 格式错误时key也为None
+    def lookup(self, text):
+        if not is_puzzle_text(text):
+            self.misses += 1
+            return None, None, None
+        key, transform = canonicalize(text)
+        solution = self.entries.get(key)
+        if solution is None:
+            self.misses += 1
+            return key, transform, None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return key, transform, invert_transform(solution, transform)
+
+    def store(self, key, transform, solution):
+        if key is None:
+            return
+        self.entries[key] = apply_transform(solution, transform)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get(self, text):
+        return self.lookup(text)[2]
+
+    def put(self, text, solution):
+        if not is_puzzle_text(text):
+            return
+        key, transform = canonicalize(text)
+        self.store(key, transform, solution)
+
+    def solve(self, text, solve=solve_text):
+        key, transform, solution = self.lookup(text)
+        if solution is None:
+            solution = solve(text)
+            if solution is not None:
+                self.store(key, transform, solution)
+        return solution
+
+    def load(self):
+        with open(self.path) as file:
+            for line in file:
+                key, solution = line.split()
+                self.entries[key] = solution
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            for key, solution in self.entries.items():
+                file.write(f"{key} {solution}\n")
+        os.replace(tmp_path, self.path)
+
+    def __str__(self):
+        return f"Cache: {self.hits} hits, {self.misses} misses ({self.hit_rate():.1%}), {len(self)} entries"
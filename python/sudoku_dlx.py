@@ -0,0 +1,214 @@
+import time
+
+from sudoku1 import SearchBudget, SolveMetrics, Sudoku
+from sudoku_topology import TOPOLOGY, topology_for
+
+
+# 精确覆盖问题的舞蹈链, 节点0是根节点, 1..columns是列头
+class DancingLinks(object):
+    def __init__(self, columns, rows):
+        self.left = [columns] + list(range(columns))
+        self.right = list(range(1, columns + 1)) + [0]
+        self.up = list(range(columns + 1))
+        self.down = list(range(columns + 1))
+        self.column = list(range(columns + 1))
+        self.size = [0] * (columns + 1)
+        self.row_of = [-1] * (columns + 1)
+        for row, cols in enumerate(rows):
+            self.add_row(row, cols)
+
+    def add_row(self, row, cols):
+        left, right, up, down = self.left, self.right, self.up, self.down
+        first = len(up)
+        for col in cols:
+            col += 1
+            node = len(up)
+            up.append(up[col])
+            down.append(col)
+            down[up[col]] = node
+            up[col] = node
+            self.column.append(col)
+            self.size[col] += 1
+            self.row_of.append(row)
+            left.append(node - 1 if node != first else node)
+            right.append(first)
+            right[left[node]] = node
+            left[first] = node
+
+    def cover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    # 选中包含node的行, 覆盖这一行的其他列
+    def select(self, node):
+        j = self.right[node]
+        while j != node:
+            self.cover(self.column[j])
+            j = self.right[j]
+
+    def unselect(self, node):
+        j = self.left[node]
+        while j != node:
+            self.uncover(self.column[j])
+            j = self.left[j]
+
+    # 剩余可选行最少的列, 没有剩余列时返回0
+    def best_column(self):
+        right, size = self.right, self.size
+        best = 0
+        best_size = None
+        col = right[0]
+        while col != 0:
+            if best_size is None or size[col] < best_size:
+                best = col
+                best_size = size[col]
+                if best_size <= 1:
+                    break
+            col = right[col]
+        return best
+
+
+# 每个候选(格子, 数字)覆盖4列: 格子有数, 行有该数, 列有该数, 宫有该数
+def candidate_columns(cell, n, topology=TOPOLOGY):
+    row, col = topology.indexes[cell]
+    cells, size = topology.cells, topology.size
+    return (
+        cell,
+        cells + row * size + n - 1,
+        2 * cells + col * size + n - 1,
+        3 * cells + topology.block_of[cell] * size + n - 1,
+    )
+
+
+# 用舞蹈链(Algorithm X)求解的引擎, 接口和SudokuSolver相同
+class DLXSolver(object):
+    def __init__(self, text):
+        self.metrics = SolveMetrics()
+        start = time.perf_counter_ns()
+        self.topology = topology = topology_for(text)
+        rows = [candidate_columns(cell, n, topology) for cell in range(topology.cells) for n in topology.digits]
+        self.links = DancingLinks(4 * topology.cells, rows)
+        self.values = [0] * topology.cells
+        self.init_grid(text)
+        self.metrics.init_ns = time.perf_counter_ns() - start
+        self.budget = None
+        self.guess_count = 0
+        self.solutions = []
+
+    def init_grid(self, text):
+        links = self.links
+        topology = self.topology
+        for cell, n in enumerate(topology.cell_values(text)):
+            if n == 0:
+                continue
+            cols = candidate_columns(cell, n, topology)
+            node = links.down[cols[0] + 1]
+            while node != cols[0] + 1 and links.row_of[node] != cell * topology.size + n - 1:
+                node = links.down[node]
+            if node == cols[0] + 1:
+                raise Exception("Invalid Sudoku!")
+            links.cover(links.column[node])
+            links.select(node)
+            self.values[cell] = n
+
+    def set_row(self, node):
+        cell, n = divmod(self.links.row_of[node], self.topology.size)
+        self.values[cell] = n + 1
+        return cell
+
+    # limit为None时找到第一个解就停止并保留在values中
+    def dfs(self, limit=None, depth=0):
+        self.metrics.enter(depth)
+        if self.budget is not None:
+            self.budget.check(self.metrics.nodes)
+        links = self.links
+        col = links.best_column()
+        if col == 0:
+            self.solutions.append(self.to_plain_text())
+            return True
+        if links.size[col] == 0:
+            return False
+        if links.size[col] > 1:
+            self.guess_count += 1
+            self.metrics.guesses += 1
+
+        links.cover(col)
+        node = links.down[col]
+        found = False
+        while node != col:
+            cell = self.set_row(node)
+            links.select(node)
+            found = self.dfs(limit, depth + 1)
+            if found and limit is None:
+                break
+            links.unselect(node)
+            self.values[cell] = 0
+            self.metrics.backtracks += 1
+            if limit is not None and len(self.solutions) >= limit:
+                break
+            node = links.down[node]
+        if found and limit is None:
+            return True
+        links.uncover(col)
+        return False
+
+    def search(self, node_limit=None, timeout=None):
+        self.solutions = []
+        self.budget = SearchBudget(node_limit, timeout) if node_limit or timeout else None
+        start = time.perf_counter_ns()
+        try:
+            return self.dfs()
+        finally:
+            self.metrics.search_ns += time.perf_counter_ns() - start
+
+    def count_solutions(self, limit=2, node_limit=None, timeout=None):
+        self.solutions = []
+        self.budget = SearchBudget(node_limit, timeout) if node_limit or timeout else None
+        start = time.perf_counter_ns()
+        try:
+            self.dfs(limit)
+        finally:
+            self.metrics.search_ns += time.perf_counter_ns() - start
+        return len(self.solutions)
+
+    def has_unique_solution(self):
+        return self.count_solutions(2) == 1
+
+    def to_plain_text(self):
+        return self.topology.to_text(self.values)
+
+    def solve(self):
+        Sudoku(self.to_plain_text()).print_grid_simple()
+
+        if not self.search():
+            raise Exception("Sudoku is wrong")
+
+        print("\nAnswer:")
+        Sudoku(self.to_plain_text()).print_grid_simple()
+        print(f"Guess Count: {self.guess_count}")
+        print(f"Elapsed Time: {round(self.metrics.search_ns / 1e9, 2)}s")
+        return self.to_plain_text()
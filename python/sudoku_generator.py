@@ -0,0 +1,161 @@
+import argparse
+import random
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool
+
+from sudoku1 import ADAPTIVE_FINDERS, FinderPipeline, SolveAborted, SudokuSolver
+from sudoku_dlx import DLXSolver
+from sudoku_topology import TOPOLOGY, get_topology
+
+# 各技巧对应的难度, 评级取解题过程中用到的最难的技巧, 需要猜测时为extreme
+TECHNIQUE_GRADES = {
+    "UniqueCandidateFinder": "easy",
+    "ImplicitUniqueCandidateFinder": "easy",
+    "BlockCandidateFinder": "medium",
+    "ImplicitDoubleCandidateFinder": "hard",
+    "DoubleCandidateFinder": "hard",
+    "TripleCandidateFinder": "expert",
+    "TripleCandidateFinder2": "expert",
+    "RectangleCandidateFinder": "expert",
+}
+GRADES = ("easy", "medium", "hard", "expert", "extreme")
+# 评分 = 各技巧删减数 * 权重 + 猜测次数 * GUESS_WEIGHT
+TECHNIQUE_WEIGHTS = {finder_ctor.__name__: i + 1 for i, finder_ctor in enumerate(ADAPTIVE_FINDERS)}
+GUESS_WEIGHT = 100
+# 唯一性检查的搜索节点上限, 超过时保守地保留这个数字, 避免大数独在少数格子上搜索过久
+REMOVAL_NODE_LIMIT = 200
+
+
+# 先随机填对角线上互不相关的几个宫, 再用DLX补全
+def random_grid(rng, topology=TOPOLOGY):
+    values = [0] * topology.cells
+    for block in range(0, topology.size, topology.box + 1):
+        digits = list(topology.digits)
+        rng.shuffle(digits)
+        for cell, n in zip(topology.blocks[block], digits):
+            values[cell] = n
+    solver = DLXSolver(topology.to_text(values))
+    solver.search()
+    return solver.values
+
+
+# 去掉cell上的数后, 只要不存在cell取其他数的解, 就仍然是唯一解
+# 只需要在排除原来的数之后找一个解, 不需要数到2个解; 大多数情况下候选数删减直接发现矛盾, 不用猜测
+def is_removable(values, cell, solution, topology=TOPOLOGY):
+    values = list(values)
+    values[cell] = 0
+    solver = SudokuSolver(topology.to_text(values))
+    index = topology.indexes[cell]
+    candidates = solver.sudoku.grid[index].candidates - {solution[cell]}
+    if not candidates:
+        return True
+    solver.sudoku.set_candidates(index, candidates)
+    try:
+        return not solver.search(REMOVAL_NODE_LIMIT)
+    except SolveAborted:
+        return False
+
+
+# 从完整的解开始按随机顺序去掉数字, symmetric时成对去掉中心对称的两个格子
+def remove_clues(solution, rng, symmetric=True, min_clues=17, topology=TOPOLOGY):
+    values = list(solution)
+    cells = list(range(topology.cells))
+    rng.shuffle(cells)
+    tried = set()
+    for cell in cells:
+        group = sorted({cell, topology.cells - 1 - cell}) if symmetric else [cell]
+        if cell in tried or sum(1 for n in values if n) - len(group) < min_clues:
+            continue
+        tried.update(group)
+        kept = list(values)
+        for c in group:
+            if is_removable(values, c, solution, topology):
+                values[c] = 0
+            else:
+                values = kept
+                break
+    return values
+
+
+# 只用删减技巧求解, 技巧按由易到难的顺序尝试, 返回(评级, 评分, 各技巧删减数)
+def rate(text):
+    solver = SudokuSolver(text, pipeline=FinderPipeline(ADAPTIVE_FINDERS, adaptive=True))
+    solver.search()
+    metrics = solver.metrics
+    grade = GRADES[-1] if metrics.guesses else GRADES[0]
+    if not metrics.guesses:
+        for name in metrics.eliminations:
+            grade = max(grade, TECHNIQUE_GRADES[name], key=GRADES.index)
+    score = sum(TECHNIQUE_WEIGHTS[name] * n for name, n in metrics.eliminations.items())
+    score += metrics.guesses * GUESS_WEIGHT
+    return grade, score, dict(metrics.eliminations)
+
+
+class GeneratedPuzzle(object):
+    def __init__(self, puzzle, solution, grade, score, techniques):
+        self.puzzle = puzzle
+        self.solution = solution
+        self.grade = grade
+        self.score = score
+        self.techniques = techniques
+
+    def clues(self):
+        return len(self.puzzle) - self.puzzle.count(".")
+
+    def __str__(self):
+        return f"{self.puzzle} {self.grade} {self.score} {self.clues()}"
+
+
+def generate_one(seed, symmetric=True, box=3):
+    rng = random.Random(seed)
+    topology = get_topology(box)
+    solution = random_grid(rng, topology)
+    puzzle = topology.to_text(remove_clues(solution, rng, symmetric, 17 if box == 3 else 0, topology))
+    return GeneratedPuzzle(puzzle, topology.to_text(solution), *rate(puzzle))
+
+
+# 按种子并行生成, grades不为空时只保留这些评级的数独, 最多尝试max_attempts个种子
+def generate(count, workers=None, seed=0, symmetric=True, grades=None, max_attempts=None, box=3):
+    func = partial(generate_one, symmetric=symmetric, box=box)
+    seeds = range(seed, seed + (max_attempts or count * (1 if not grades else 100)))
+    pool = None if workers == 1 else Pool(workers)
+    found = 0
+    try:
+        for puzzle in map(func, seeds) if pool is None else pool.imap_unordered(func, seeds, 4):
+            if grades and puzzle.grade not in grades:
+                continue
+            yield puzzle
+            found += 1
+            if found >= count:
+                return
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate rated sudoku puzzles with unique solutions.")
+    parser.add_argument("-n", "--count", type=int, default=10, help="puzzles to generate")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="first random seed, one seed per puzzle")
+    parser.add_argument("-g", "--grade", nargs="+", choices=GRADES, default=None, help="only keep these grades")
+    parser.add_argument("--asymmetric", action="store_true", help="remove clues one at a time")
+    parser.add_argument("-b", "--box", type=int, default=3, help="box size: 3 for 9x9, 4 for 16x16, 5 for 25x25")
+    parser.add_argument("--solutions", action="store_true", help="also print the solution of each puzzle")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    total = 0
+    for puzzle in generate(args.count, args.workers, args.seed, not args.asymmetric, args.grade, box=args.box):
+        print(f"{puzzle} {puzzle.solution}" if args.solutions else puzzle)
+        total += 1
+    elapsed = time.perf_counter() - start
+    print(f"Generated {total} puzzles in {elapsed:.2f}s ({total / elapsed * 60 if elapsed else 0:.0f} puzzles/min)",
+          file=sys.stderr)
+    return 0 if total == args.count else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import argparse
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool
+
+from sudoku1 import ENGINES, BestPointFinder, SudokuSolver, create_solver
+
+
+# 从根节点按BestPointFinder展开depth层, 返回各个子树对应的数独文本
+# 展开过程中已经解完的节点也作为子树返回, 无解的分支直接丢弃
+def expand_frontier(text, depth):
+    solver = SudokuSolver(text)
+    sudoku = solver.sudoku
+    frontier = []
+
+    def walk(level):
+        state = solver.solve_unique_solutions()
+        if state is None:
+            return
+        if state or level == depth:
+            frontier.append(sudoku.to_plain_text())
+            return
+        for index, n in BestPointFinder(sudoku, **solver.branching).find_branches():
+            mark = sudoku.mark()
+            if sudoku.set_point_value(index, n):
+                walk(level + 1)
+            sudoku.rollback(mark)
+
+    walk(0)
+    return frontier
+
+
+# 在worker进程中求解一个子树, limit为None时只找一个解
+def solve_subtree(text, engine="finders", limit=None):
+    try:
+        solver = create_solver(text, engine)
+        if limit is None:
+            return [solver.to_plain_text()] if solver.search() else []
+        solver.count_solutions(limit)
+        return solver.solutions
+    except Exception:
+        return []
+
+
+# 把子树分给进程池, 找到limit个解后终止其余worker
+def search_frontier(text, limit, workers=None, depth=2, engine="finders"):
+    frontier = expand_frontier(text, depth)
+    solutions = []
+    if not frontier:
+        return solutions
+    pool = Pool(workers)
+    try:
+        for found in pool.imap_unordered(partial(solve_subtree, engine=engine, limit=limit), frontier):
+            solutions.extend(found)
+            if len(solutions) >= (limit or 1):
+                break
+    finally:
+        pool.terminate()
+    return solutions[:limit or 1]
+
+
+def parallel_solve(text, workers=None, depth=2, engine="finders"):
+    solutions = search_frontier(text, None, workers, depth, engine)
+    return solutions[0] if solutions else None
+
+
+def parallel_count_solutions(text, limit=2, workers=None, depth=2, engine="finders"):
+    return len(search_frontier(text, limit, workers, depth, engine))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve one hard sudoku by searching its top-level branches in parallel.")
+    parser.add_argument("puzzle", help="81-character puzzle")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("-d", "--depth", type=int, default=2, help="branching levels expanded before dispatch")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="finders", help="engine used for each subtree")
+    parser.add_argument("--count", type=int, default=None, help="count solutions up to this limit")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    # 格式错误或已知数冲突的数独在展开时就会抛出异常
+    try:
+        if args.count:
+            result = parallel_count_solutions(args.puzzle, args.count, args.workers, args.depth, args.engine)
+        else:
+            result = parallel_solve(args.puzzle, args.workers, args.depth, args.engine)
+    except Exception as e:
+        print(f"Sudoku is wrong: {e}", file=sys.stderr)
+        return 1
+    if result is None:
+        print("Sudoku is wrong", file=sys.stderr)
+        return 1
+    print(result)
+    print(f"Elapsed Time: {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from sudoku1 import ENGINES, SolveAborted, create_solver
+
+# worker的时间预算到了之后, 再等多久才放弃等待结果
+TIMEOUT_GRACE = 0.5
+HTTP_STATUS = {
+    "solved": (200, "OK"),
+    "unsolvable": (422, "Unprocessable Entity"),
+    "invalid": (422, "Unprocessable Entity"),
+    "timeout": (504, "Gateway Timeout"),
+    "busy": (503, "Service Unavailable"),
+}
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+# 请求中的timeout(秒), 没有给出时为None, 不是有限的非负数时抛出ValueError
+def parse_timeout(value):
+    if value is None or value == "":
+        return None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timeout: {value!r}")
+    if not 0 <= timeout < float("inf"):
+        raise ValueError(f"Invalid timeout: {value!r}")
+    return timeout
+
+
+# 在worker进程中运行, dfs按node_limit和timeout协作式退出
+# deadline是请求被接受时算出的绝对时间(time.time()), 在队列中等待过久的请求一开始就放弃
+def solve_request(text, engine="finders", node_limit=None, timeout=None, deadline=None):
+    start = time.perf_counter()
+    if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return {"status": "timeout", "error": "Deadline exceeded in queue", "elapsed": 0.0}
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    try:
+        solver = create_solver(text, engine)
+        solved = solver.search(node_limit, timeout)
+    except SolveAborted as e:
+        return {"status": "timeout", "error": str(e), "elapsed": time.perf_counter() - start}
+    except Exception as e:
+        return {"status": "invalid", "error": str(e), "elapsed": time.perf_counter() - start}
+    result = {
+        "status": "solved" if solved else "unsolvable",
+        "guesses": solver.guess_count,
+        "nodes": solver.metrics.nodes,
+        "elapsed": time.perf_counter() - start,
+    }
+    if solved:
+        result["solution"] = solver.to_plain_text()
+    return result
+
+
+# 进程池前面的异步入口, 进行中的请求超过max_pending时直接拒绝, 不在队列里排队
+# pending在worker真正结束(或任务在开始前被取消)时才减少, 调用方不再等待的请求仍然计入
+class SolverService(object):
+    def __init__(self, workers=None, max_pending=None, engine="finders", node_limit=None, timeout=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.max_pending = max_pending or self.workers * 4
+        self.engine = engine
+        self.node_limit = node_limit
+        self.timeout = timeout
+        self.pending = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def solve(self, text, timeout=None):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceBusy(f"Too many pending requests ({self.pending})")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.time() + timeout
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(solve_request, text, self.engine, self.node_limit, timeout, deadline)
+        self.pending += 1
+        future.add_done_callback(partial(self.on_done, loop))
+        try:
+            wait = None if timeout is None else timeout + TIMEOUT_GRACE
+            return await asyncio.wait_for(asyncio.wrap_future(future), wait)
+        except asyncio.TimeoutError:
+            return {"status": "timeout", "error": "No result from worker"}
+
+    # 在执行器的线程中调用, 关闭服务时事件循环可能已经结束
+    def on_done(self, loop, future):
+        try:
+            loop.call_soon_threadsafe(self.finish)
+        except RuntimeError:
+            pass
+
+    def finish(self):
+        self.pending -= 1
+        self.served += 1
+
+    # 和solve一样, 但忙时返回busy状态而不是抛出异常
+    async def handle(self, text, timeout=None):
+        try:
+            return await self.solve(text, timeout)
+        except ServiceBusy as e:
+            return {"status": "busy", "error": str(e)}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __str__(self):
+        return f"Service: {self.served} served, {self.rejected} rejected, {self.pending} pending"
+
+
+default_service = None
+
+
+def get_service():
+    global default_service
+    if default_service is None:
+        default_service = SolverService()
+    return default_service
+
+
+async def solve_async(text, timeout=None):
+    return await get_service().solve(text, timeout)
+
+
+# 每行一个数独(或{"id": ..., "puzzle": ..., "timeout": ...}), 每个结果输出一行JSON, 输出顺序按完成先后
+async def serve_stdio(service, input_file=sys.stdin, output_file=sys.stdout):
+    loop = asyncio.get_running_loop()
+    tasks = set()
+
+    async def answer(request_id, text, timeout):
+        result = await service.handle(text, timeout)
+        result["id"] = request_id
+        output_file.write(json.dumps(result) + "\n")
+        output_file.flush()
+
+    # 没有给出id的请求按行号编号, 与JSON请求自带的id无关
+    line_number = 0
+    while True:
+        line = await loop.run_in_executor(None, input_file.readline)
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        request_id = line_number
+        line_number += 1
+        timeout = None
+        if line[0] in "{[":
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+                request_id = request.get("id", request_id)
+                timeout = parse_timeout(request.get("timeout"))
+            except ValueError as e:
+                output_file.write(json.dumps({"status": "invalid", "error": str(e), "id": request_id}) + "\n")
+                output_file.flush()
+                continue
+            line = request.get("puzzle", "")
+        task = asyncio.ensure_future(answer(request_id, line, timeout))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def read_http_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) < 2:
+        return None, None, b""
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = b""
+    if "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    return request_line[0], request_line[1], body
+
+
+# GET /solve?puzzle=...&timeout=... 或 POST /solve, 请求体为数独文本或JSON
+async def handle_http(service, reader, writer):
+    try:
+        method, target, body = await read_http_request(reader)
+        url = urlsplit(target or "")
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if method == "POST" and body:
+                body = body.decode().strip()
+                request = json.loads(body) if body.startswith("{") else {"puzzle": body}
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+                query.update(request)
+            timeout = parse_timeout(query.get("timeout"))
+        except ValueError as e:
+            status, reason, result = 400, "Bad Request", {"status": "invalid", "error": str(e)}
+        else:
+            if url.path != "/solve" or "puzzle" not in query:
+                status, reason, result = 404, "Not Found", {"error": "Use /solve?puzzle=..."}
+            else:
+                result = await service.handle(query["puzzle"], timeout)
+                status, reason = HTTP_STATUS[result["status"]]
+        payload = json.dumps(result).encode()
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_http(service, host, port):
+    server = await asyncio.start_server(partial(handle_http, service), host, port)
+    print(f"Listening on http://{host}:{port}/solve", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve sudoku solving over stdin/stdout or HTTP.")
+    parser.add_argument("--http", metavar="PORT", type=int, help="listen for HTTP requests instead of stdin")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("-q", "--max-pending", type=int, default=None, help="requests in flight before rejecting")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="finders")
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="default per-request timeout in seconds")
+    parser.add_argument("--node-limit", type=int, default=None, help="search nodes allowed per request")
+    args = parser.parse_args(argv)
+
+    service = SolverService(args.workers, args.max_pending, args.engine, args.node_limit, args.timeout)
+    try:
+        if args.http:
+            asyncio.run(serve_http(service, args.host, args.http))
+        else:
+            asyncio.run(serve_stdio(service))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(service, file=sys.stderr)
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
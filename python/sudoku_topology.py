@@ -0,0 +1,149 @@
+from functools import lru_cache
+
+# 数字的字符表示, 9以上用字母, 最大支持25x25
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+EMPTY_SYMBOLS = ".0"
+MAX_BOX = 5
+# 大数独按需计算的掩码表最多保存的条目数, Topology是进程内共享的, 不能随求解的数独无限增长
+MASK_TABLE_SIZE = 1 << 16
+
+
+# 候选数位掩码 -> 候选数, 只在用到时计算, 用于位数太多无法预先建表的大数独
+# 超过max_size时整个清空, 常驻进程中的内存保持有界
+class MaskTable(dict):
+    def __init__(self, convert, max_size=MASK_TABLE_SIZE):
+        super().__init__()
+        self.convert = convert
+        self.max_size = max_size
+
+    def __missing__(self, mask):
+        if len(self) >= self.max_size:
+            self.clear()
+        value = self[mask] = self.convert(mask)
+        return value
+
+
+# 宫的边长为box的数独的各种下标表, box=3时即标准的9x9数独
+class Topology(object):
+    def __init__(self, box):
+        size = box * box
+        cells = size * size
+        self.box = box
+        self.size = size
+        self.cells = cells
+        self.digits = tuple(range(1, size + 1))
+        self.full_mask = (1 << size) - 1
+        self.symbols = SYMBOLS[:size]
+        # 格子编号 -> (行, 列)
+        self.indexes = tuple(divmod(cell, size) for cell in range(cells))
+
+        self.rows = tuple(tuple(row * size + col for col in range(size)) for row in range(size))
+        self.cols = tuple(tuple(row * size + col for row in range(size)) for col in range(size))
+        self.blocks = tuple(
+            tuple((block // box * box + i // box) * size + block % box * box + i % box for i in range(size))
+            for block in range(size)
+        )
+        self.units = self.rows + self.cols + self.blocks
+        # Sudoku.get_regions的顺序: 第i行, 第i列, 第i宫
+        self.region_order = tuple(unit for i in range(size) for unit in (i, size + i, 2 * size + i))
+        self.row_col_order = tuple(unit for unit in self.region_order if unit < 2 * size)
+        self.row_units = tuple(range(size))
+        self.block_units = tuple(range(2 * size, 3 * size))
+
+        self.block_of = tuple(row // box * box + col // box for row, col in self.indexes)
+        self.cell_units = tuple(
+            (row, size + col, 2 * size + self.block_of[cell]) for cell, (row, col) in enumerate(self.indexes))
+        self.peers = tuple(
+            tuple(sorted(set(self.rows[row] + self.cols[col] + self.blocks[self.block_of[cell]]) - {cell}))
+            for cell, (row, col) in enumerate(self.indexes)
+        )
+
+        # 数字 -> 位, 下标0不使用
+        self.bits = (0,) + tuple(1 << (n - 1) for n in self.digits)
+        # 9x9时候选数组合只有512种, 直接建表; 更大的数独按需计算, 表的大小有上限
+        if box <= 3:
+            self.mask_digits = tuple(self.to_digits(mask) for mask in range(self.full_mask + 1))
+            self.mask_sets = tuple(frozenset(digits) for digits in self.mask_digits)
+            self.interned = {candidates: candidates for candidates in self.mask_sets}
+        else:
+            self.mask_digits = MaskTable(self.to_digits)
+            self.mask_sets = MaskTable(lambda mask: frozenset(self.to_digits(mask)))
+            self.interned = None
+
+    # 相同的候选数集合共用同一个frozenset, 撤销日志和各个格子只保存引用
+    # 大数独经由有上限的mask_sets共享, 表清空后已取得的集合仍然有效, 只是不再共享
+    def intern(self, candidates):
+        if self.interned is None:
+            return self.mask_sets[self.to_mask(candidates)]
+        candidates = frozenset(candidates)
+        return self.interned.get(candidates, candidates)
+
+    def to_digits(self, mask):
+        return tuple(n for n in self.digits if mask & self.bits[n])
+
+    def to_mask(self, candidates):
+        mask = 0
+        bits = self.bits
+        for n in candidates:
+            mask |= bits[n]
+        return mask
+
+    # 数独文本, 或数字序列(如二进制格式中的一行) -> 各格子的数字, 0为空格
+    def cell_values(self, grid):
+        if isinstance(grid, str):
+            symbols = self.symbols
+            try:
+                values = [0 if n in EMPTY_SYMBOLS else symbols.index(n.upper()) + 1 for n in grid]
+            except ValueError:
+                raise Exception("Invalid Sudoku!")
+        else:
+            values = [int(n) for n in grid]
+        if len(values) != self.cells:
+            raise Exception("Invalid Sudoku!")
+        return values
+
+    def to_text(self, values):
+        symbols = self.symbols
+        return "".join(symbols[n - 1] if n else "." for n in values)
+
+
+@lru_cache(maxsize=None)
+def get_topology(box=3):
+    if not 2 <= box <= MAX_BOX:
+        raise Exception(f"Unsupported box size: {box}")
+    return Topology(box)
+
+
+# 根据文本长度判断数独大小: 81 -> 3, 256 -> 4, 625 -> 5
+def topology_for(text):
+    for box in range(2, MAX_BOX + 1):
+        if len(text) == box ** 4:
+            return get_topology(box)
+    raise Exception("Invalid Sudoku!")
+
+
+# 标准9x9数独的表, 供只支持9x9的模块直接使用
+TOPOLOGY = get_topology(3)
+BOX = TOPOLOGY.box
+SIZE = TOPOLOGY.size
+CELLS = TOPOLOGY.cells
+DIGITS = TOPOLOGY.digits
+FULL_MASK = TOPOLOGY.full_mask
+INDEXES = TOPOLOGY.indexes
+ROWS = TOPOLOGY.rows
+COLS = TOPOLOGY.cols
+BLOCKS = TOPOLOGY.blocks
+UNITS = TOPOLOGY.units
+REGION_ORDER = TOPOLOGY.region_order
+ROW_COL_ORDER = TOPOLOGY.row_col_order
+ROW_UNITS = TOPOLOGY.row_units
+BLOCK_UNITS = TOPOLOGY.block_units
+BLOCK_OF = TOPOLOGY.block_of
+CELL_UNITS = TOPOLOGY.cell_units
+PEERS = TOPOLOGY.peers
+BITS = TOPOLOGY.bits
+POPCOUNT = tuple(len(digits) for digits in TOPOLOGY.mask_digits)
+MASK_DIGITS = TOPOLOGY.mask_digits
+MASK_SETS = TOPOLOGY.mask_sets
+to_mask = TOPOLOGY.to_mask
+cell_values = TOPOLOGY.cell_values
@@ -0,0 +1,183 @@
+import argparse
+import json
+import sys
+
+from sudoku1 import BRANCHINGS, SolveHook, Sudoku, SudokuSolver
+from sudoku_bitmask import BitmaskSudoku
+from sudoku_topology import TOPOLOGY
+
+# 猜测步骤的名字, 和debug输出中的一致
+GUESS = "BestPointFinder"
+
+
+# 求解过程记录为JSON lines, 每行一步:
+#   {"step": 0, "puzzle": "..."}                                              开局
+#   {"step": 1, "finder": "...", "set": [[格子, 数]], "eliminate": [[格子, [候选数]]]}  Finder或猜测(finder为BestPointFinder)
+#   {"step": 9, "backtrack": 5, "cell": 40, "value": 3}                       撤销第5步的猜测及之后的所有步骤
+#   {"step": 10, "solved": true, "solution": "..."}                           结束
+# 格子为0开始的编号, 记录时只取撤销日志的一段, 不打印也不渲染, 写入按buffer_size行批量进行
+class TraceRecorder(SolveHook):
+    def __init__(self, file, buffer_size=1024):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.step = 0
+        self.guesses = []
+
+    def write(self, event):
+        self.buffer.append(json.dumps(event, separators=(",", ":")))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer.clear()
+
+    def start(self, puzzle):
+        self.write({"step": self.step, "puzzle": puzzle})
+
+    def on_changes(self, sudoku, name, mark):
+        self.step += 1
+        changes = sudoku.changes_since(mark)
+        event = {"step": self.step, "finder": name}
+        assigned = [[cell, value] for cell, value, removed in changes if value]
+        eliminated = [[cell, sorted(removed)] for cell, value, removed in changes if removed]
+        if assigned:
+            event["set"] = assigned
+        if eliminated:
+            event["eliminate"] = eliminated
+        if name == GUESS:
+            self.guesses.append(self.step)
+        self.write(event)
+
+    def on_rollback(self, sudoku, index, value):
+        self.step += 1
+        row, col = index
+        self.write({"step": self.step, "backtrack": self.guesses.pop(),
+                    "cell": row * sudoku.topology.size + col, "value": value})
+
+    def finish(self, solution):
+        self.step += 1
+        event = {"step": self.step, "solved": solution is not None}
+        if solution is not None:
+            event["solution"] = solution
+        self.write(event)
+        self.flush()
+
+
+# 求解一个数独并把过程写入file, 返回解, 无解时返回None
+def record(text, file, bitmask=False, branching="first", buffer_size=1024):
+    recorder = TraceRecorder(file, buffer_size)
+    recorder.start(text)
+    solver = SudokuSolver(text, BitmaskSudoku if bitmask else Sudoku, hook=recorder, branching=branching)
+    solution = solver.to_plain_text() if solver.search() else None
+    recorder.finish(solution)
+    return solution
+
+
+def read_trace(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# 按记录重放, 每一步之后产出(event, sudoku), sudoku是同一个对象, 需要保存时自行复制
+# 开局时重新构造Sudoku(与求解时相同的初始删减), 之后直接套用记录的变化, 不运行任何Finder
+def replay(events):
+    sudoku = None
+    marks = {}
+    for event in events:
+        if "puzzle" in event:
+            sudoku = Sudoku(event["puzzle"])
+        elif "backtrack" in event:
+            sudoku.rollback(marks.pop(event["backtrack"]))
+        elif "finder" in event:
+            if event["finder"] == GUESS:
+                marks[event["step"]] = sudoku.mark()
+            apply_changes(sudoku, event)
+        yield event, sudoku
+
+
+def apply_changes(sudoku, event):
+    points = sudoku.points
+    intern = sudoku.topology.intern
+    for cell, value in event.get("set", ()):
+        point = points[cell]
+        sudoku.save_point(point)
+        point.value = value
+        point.candidates = None
+    for cell, removed in event.get("eliminate", ()):
+        point = points[cell]
+        sudoku.save_point(point)
+        point.candidates = intern(point.candidates - set(removed))
+
+
+# 一步的文字说明, 格子的写法和debug输出相同(A1为第一行第一列)
+def describe(event, topology=TOPOLOGY):
+    def name(cell):
+        row, col = topology.indexes[cell]
+        return f"{chr(row + 65)}{col + 1}"
+
+    def digits(values):
+        return "".join(topology.symbols[n - 1] for n in values)
+
+    if "puzzle" in event:
+        return f"{event['step']}\tStart"
+    if "backtrack" in event:
+        return f"{event['step']}\tRollback to {event['backtrack']}\t{name(event['cell'])}\t{digits([event['value']])}"
+    if "solved" in event:
+        return f"{event['step']}\t{'Solved' if event['solved'] else 'No solution'}"
+    assigned = " ".join(f"{name(cell)}={digits([value])}" for cell, value in event.get("set", ()))
+    eliminated = " ".join(f"{name(cell)}-{digits(removed)}" for cell, removed in event.get("eliminate", ()))
+    return f"{event['step']}\t{event['finder']}\t{assigned}\t{eliminated}".rstrip()
+
+
+# 只在需要时渲染: steps为None时列出每一步的说明, 否则在这些步骤之后画出整个盘面
+def render(events, steps=None, output=None):
+    output = output or sys.stdout
+    for event, sudoku in replay(events):
+        if steps is None:
+            print(describe(event, sudoku.topology), file=output)
+        elif event["step"] in steps:
+            print(describe(event, sudoku.topology), file=output)
+            stdout, sys.stdout = sys.stdout, output
+            try:
+                sudoku.print_grid(True)
+            finally:
+                sys.stdout = stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a solve as a JSON lines trace, or render a recorded trace.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="solve a puzzle and write its trace")
+    record_parser.add_argument("puzzle")
+    record_parser.add_argument("-o", "--output", default="-", help="trace file, '-' for stdout")
+    record_parser.add_argument("--bitmask", action="store_true", help="use the bitmask backend")
+    record_parser.add_argument("--branching", choices=BRANCHINGS, default="first")
+    render_parser = commands.add_parser("render", help="list the steps of a trace, or draw the grid at some steps")
+    render_parser.add_argument("input", help="trace file, '-' for stdin")
+    render_parser.add_argument("-s", "--step", type=int, nargs="+", default=None, help="draw the grid after these steps")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+        try:
+            solution = record(args.puzzle, output_file, args.bitmask, args.branching)
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+        return 0 if solution else 1
+    input_file = sys.stdin if args.input == "-" else open(args.input)
+    try:
+        render(read_trace(input_file), None if args.step is None else set(args.step))
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
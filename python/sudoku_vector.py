@@ -0,0 +1,79 @@
+import numpy as np
+
+from sudoku_batch import is_puzzle_text, solve_text
+from sudoku_topology import CELL_UNITS, CELLS, SIZE, UNITS
+
+DIGITS = np.arange(1, SIZE + 1, dtype=np.int8)
+UNIT_INDEX = np.array(UNITS)
+CELL_UNIT_INDEX = np.array(CELL_UNITS)
+# 行/列/宫三组区域展开后, 按格子编号重新排列用的下标
+GROUP_ORDER = tuple(np.argsort(UNIT_INDEX[g * SIZE:(g + 1) * SIZE].ravel()) for g in range(3))
+
+
+def parse(puzzles):
+    raw = np.frombuffer("".join(puzzles).encode(), dtype=np.uint8).reshape(len(puzzles), CELLS)
+    values = raw.astype(np.int8) - ord("0")
+    values[raw == ord(".")] = 0
+    return values
+
+
+def to_text(values):
+    return (values + ord("0")).astype(np.uint8).tobytes().decode().replace("0", ".")
+
+
+# 对一批(N, 81)的数独同时做唯一候选数法和隐性唯一候选数法, 直到没有变化
+# 返回填好的values和每个数独是否已经发现矛盾
+def propagate(values):
+    values = values.copy()
+    invalid = np.zeros(len(values), dtype=bool)
+    active = np.arange(len(values))
+    while len(active):
+        sub = values[active]
+        count = len(sub)
+        placed = sub[:, :, None] == DIGITS
+        unit_placed = placed[:, UNIT_INDEX].sum(axis=2)
+        empty = sub == 0
+        candidates = ~(unit_placed > 0)[:, CELL_UNIT_INDEX].any(axis=2) & empty[:, :, None]
+        counts = candidates.sum(axis=2)
+        unit_counts = candidates[:, UNIT_INDEX].sum(axis=2)
+        bad = (unit_placed > 1).any(axis=(1, 2))
+        bad |= (empty & (counts == 0)).any(axis=1)
+        bad |= ((unit_counts == 0) & (unit_placed == 0)).any(axis=(1, 2))
+
+        found = candidates & (counts == 1)[:, :, None]
+        hidden = candidates[:, UNIT_INDEX] & (unit_counts == 1)[:, :, None, :]
+        for g, order in enumerate(GROUP_ORDER):
+            found |= hidden[:, g * SIZE:(g + 1) * SIZE].reshape(count, CELLS, SIZE)[:, order]
+        bad |= (found.sum(axis=2) > 1).any(axis=1)
+        found &= ~bad[:, None, None]
+
+        cells = found.any(axis=2)
+        sub[cells] = found.argmax(axis=2)[cells] + 1
+        values[active] = sub
+        invalid[active] |= bad
+        active = active[cells.any(axis=1)]
+    return values, invalid
+
+
+# 先整批向量化处理, 剩下没解完的再交给engine对应的求解器
+# 返回(N, 81)的解, 无解的行全为0
+def solve_values(values, engine="finders"):
+    values, invalid = propagate(values)
+    values[invalid] = 0
+    for i in np.flatnonzero(~invalid & (values == 0).any(axis=1)):
+        solution = solve_text(to_text(values[i]), engine)
+        values[i] = 0 if solution is None else parse([solution])[0]
+    return values
+
+
+# 向量化只支持9x9, 其他大小的数独直接交给求解器
+def solve_batch(puzzles, engine="finders"):
+    results = [None if len(text) == CELLS else solve_text(text, engine) for text in puzzles]
+    indexes = [i for i, text in enumerate(puzzles) if is_puzzle_text(text)]
+    if not indexes:
+        return results
+    values = solve_values(parse([puzzles[i] for i in indexes]), engine)
+    for i, row in zip(indexes, values):
+        if row[0] != 0:
+            results[i] = to_text(row)
+    return results
@@ -0,0 +1,87 @@
+import os
+import sys
+
+from sudoku1 import ENGINES, create_solver
+
+# 启动速度优先的入口: 不导入numpy/argparse/multiprocessing
+# 用法: sudoku_worker.py [-e ENGINE] [PUZZLE ...]
+# 不给数独时进入常驻模式, 从stdin每行读一个数独, 每行输出一个解(无解或空行时为空行), 逐行flush
+USAGE = f"usage: sudoku_worker.py [-e {{{','.join(ENGINES)}}}] [PUZZLE ...]"
+# 每个数独的求解时间上限(秒), 超时(SolveAborted)和无解一样输出空行, 保证每行输入都有一行输出
+SOLVE_TIMEOUT = 10
+
+
+def solve_line(text, engine="finders", timeout=SOLVE_TIMEOUT):
+    try:
+        solver = create_solver(text, engine)
+        if solver.search(timeout=timeout):
+            return solver.to_plain_text()
+    except Exception:
+        pass
+    return ""
+
+
+def serve(input_file, output_file, engine="finders", timeout=SOLVE_TIMEOUT):
+    for line in input_file:
+        line = line.strip()
+        output_file.write((solve_line(line, engine, timeout) if line else "") + "\n")
+        output_file.flush()
+
+
+# 保持一个常驻的worker进程, 每次求解只需要一次管道往返
+class WarmWorker(object):
+    def __init__(self, engine="finders", python=sys.executable):
+        import subprocess
+        script = os.path.abspath(__file__)
+        self.process = subprocess.Popen([python, script, "-e", engine], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, text=True, bufsize=1)
+
+    # 无解或格式错误时返回None, 空白或多行的文本不发给worker
+    def solve(self, text):
+        text = text.strip()
+        if not text or "\n" in text:
+            return None
+        self.process.stdin.write(text + "\n")
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise Exception("Worker exited")
+        return line.strip() or None
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    engine = "finders"
+    if args[:1] in (["-h"], ["--help"]):
+        print(USAGE)
+        return 0
+    if args[:1] in (["-e"], ["--engine"]):
+        if len(args) < 2 or args[1] not in ENGINES:
+            print(USAGE, file=sys.stderr)
+            return 2
+        engine = args[1]
+        args = args[2:]
+    if not args:
+        serve(sys.stdin, sys.stdout, engine)
+        return 0
+    failed = 0
+    for text in args:
+        solution = solve_line(text, engine)
+        failed += not solution
+        print(solution)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
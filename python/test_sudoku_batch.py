@@ -0,0 +1,35 @@
+import io
+import os
+
+import pytest
+
+from sudoku1 import ENGINES
+from sudoku_batch import solve_file, solve_text
+
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+
+# 第一行有两个1, 第一列有两个1, 都不能进入搜索
+DUPLICATES = ["11" + "." * 79, "1" + "." * 8 + "1" + "." * 71]
+
+
+def load(name):
+    with open(os.path.join(CORPORA_DIR, name + ".txt")) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_duplicate_clue_is_rejected(engine):
+    for text in DUPLICATES:
+        assert solve_text(text, engine) is None
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_duplicate_clue_line_in_batch(vectorized):
+    puzzles = load("easy")[:2]
+    lines = [puzzles[0], DUPLICATES[0], puzzles[1]]
+    output = io.StringIO()
+    stats = solve_file(io.StringIO("\n".join(lines)), output, workers=1, vectorized=vectorized)
+    assert stats.count == 3 and stats.failed == 1
+    solutions = output.getvalue().split("\n")
+    assert solutions[1] == ""
+    assert solutions[0] == solve_text(puzzles[0]) and solutions[2] == solve_text(puzzles[1])
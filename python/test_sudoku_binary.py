@@ -0,0 +1,55 @@
+import io
+import os
+
+import pytest
+
+from sudoku_binary import HEADER, LAYOUTS, GridWriter, open_grids, pack_text_file, read_values, unpack_to_text_file
+from sudoku_vector import to_text
+
+CORPORA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+
+
+def load(name):
+    with open(os.path.join(CORPORA_DIR, name + ".txt")) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_pack_unpack_round_trip(tmp_path, layout):
+    puzzles = load("hard")
+    path = str(tmp_path / "grids.bin")
+    assert pack_text_file(io.StringIO("\n".join(puzzles)), path, layout) == len(puzzles)
+    assert open_grids(path)[0] == layout
+    output = io.StringIO()
+    assert unpack_to_text_file(path, output) == len(puzzles)
+    assert output.getvalue().split() == [text.replace("0", ".") for text in puzzles]
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_append(tmp_path, layout):
+    first, second = load("easy"), load("17clue")
+    path = str(tmp_path / "grids.bin")
+    with GridWriter(path, layout) as writer:
+        writer.write_texts(first)
+    with GridWriter(path, layout) as writer:
+        writer.write_texts(second)
+    assert os.path.getsize(path) > HEADER.size
+    values = read_values(path)
+    assert [to_text(row) for row in values] == [text.replace("0", ".") for text in first + second]
+    assert [to_text(row) for row in read_values(path, len(first))] == second
+
+
+def test_append_with_other_layout_fails(tmp_path):
+    path = str(tmp_path / "grids.bin")
+    with GridWriter(path, "bytes") as writer:
+        writer.write_texts(load("easy")[:1])
+    with pytest.raises(Exception):
+        GridWriter(path, "packed")
+
+
+def test_invalid_puzzle_is_rejected(tmp_path):
+    path = str(tmp_path / "grids.bin")
+    with GridWriter(path) as writer:
+        with pytest.raises(Exception, match="Invalid Sudoku"):
+            writer.write_texts(load("easy")[:1] + load("16x16")[:1])
+        assert writer.count == 0
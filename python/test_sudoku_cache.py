@@ -0,0 +1,65 @@
+import random
+
+from sudoku_batch import solve_text
+from sudoku_cache import SolutionCache, apply_transform, canonicalize, invert_transform, to_rows, transpose
+
+PUZZLE = "..53.....8......2..7..1.5..4....53...1..7...6..32...8..6.5....9..4....3......97.."
+
+
+# 行列在带内/带间置换, 转置, 数字重编号后得到的同一个数独
+def make_variant(text, rng):
+    bands = rng.sample(range(3), 3)
+    rows = [band * 3 + r for band in bands for r in rng.sample(range(3), 3)]
+    stacks = rng.sample(range(3), 3)
+    cols = [stack * 3 + c for stack in stacks for c in rng.sample(range(3), 3)]
+    digits = dict(zip("123456789", rng.sample("123456789", 9)))
+    grid = to_rows(text)
+    if rng.random() < 0.5:
+        grid = transpose(grid)
+    return "".join(digits.get(grid[r][c], ".") for r in rows for c in cols)
+
+
+def is_solution_of(puzzle, solution):
+    if solution is None or any(p != "." and p != s for p, s in zip(puzzle, solution)):
+        return False
+    rows = to_rows(solution)
+    blocks = ["".join(rows[r][c] for r in range(b // 3 * 3, b // 3 * 3 + 3) for c in range(b % 3 * 3, b % 3 * 3 + 3))
+              for b in range(9)]
+    return all(set(unit) == set("123456789") for unit in rows + transpose(rows) + blocks)
+
+
+def test_variants_share_key():
+    rng = random.Random(1)
+    key = canonicalize(PUZZLE)[0]
+    for _ in range(20):
+        assert canonicalize(make_variant(PUZZLE, rng))[0] == key
+
+
+def test_transform_round_trip():
+    rng = random.Random(2)
+    for _ in range(10):
+        variant = make_variant(PUZZLE, rng)
+        key, transform = canonicalize(variant)
+        assert apply_transform(variant, transform) == key
+        assert invert_transform(key, transform) == variant
+
+
+def test_cached_solution_is_valid_for_variants():
+    rng = random.Random(3)
+    cache = SolutionCache()
+    assert is_solution_of(PUZZLE, cache.solve(PUZZLE))
+    for _ in range(10):
+        variant = make_variant(PUZZLE, rng)
+        solution = cache.solve(variant, solve=lambda text: None)
+        assert is_solution_of(variant, solution)
+    assert cache.hits == 10 and cache.misses == 1
+    assert solve_text(PUZZLE) == cache.get(PUZZLE)
+
+
+def test_invalid_text_is_not_cached():
+    cache = SolutionCache()
+    for text in ("ABCDEFGHIJ" + "." * 71, "123", "x" * 81):
+        assert cache.lookup(text) == (None, None, None)
+        assert cache.solve(text) is None
+        cache.put(text, "1" * 81)
+    assert len(cache) == 0